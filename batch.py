@@ -0,0 +1,90 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import click
+
+import config
+import utils
+from cli_helpers import collect_user_data, recommend_games
+from config import MAX_WORKERS
+from steam_user import SteamUser, resolve_vanity
+
+
+def read_user_list(path):
+    """Usernames or Steam IDs, one per line; blank lines, # comments and repeats are skipped."""
+    names = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            name = line.split("#", 1)[0].strip()
+            if name and name not in names:
+                names.append(name)
+    return names
+
+
+def resolve_all(names, max_workers=MAX_WORKERS):
+    """Map every name to a Steam ID (None if it can't be resolved), resolving vanity names in parallel."""
+    vanity_names = [name for name in names if not name.isnumeric()]
+    resolved = utils.map_concurrently(resolve_vanity, vanity_names, max_workers)
+    steam_ids = dict(zip(vanity_names, resolved))
+    return {name: name if name.isnumeric() else steam_ids[name] for name in names}
+
+
+def process_user(name, steam_id, top=15, hops=1, full_library=False, rebuild=False, offline=False):
+    """Build (or load) one user's profile and recommendations, returning a JSON-ready result."""
+    start = time.perf_counter()
+    user = SteamUser(steam_id)
+    user.username = name
+    if user.has_saved_data() and not rebuild:
+        user.use_saved_user()
+    elif offline:
+        raise ValueError("No saved user data to recommend from offline")
+    else:
+        collect_user_data(user, top, full_library)
+    if not user.top_games:
+        raise ValueError("No games found (is the profile private?)")
+
+    recommendations = recommend_games(user, hops, offline)
+    return {"user": name, "steamid": user.user_id, "top_tags": user.top_tags,
+            "recommendations": [game.as_dict() for game in recommendations],
+            "seconds": round(time.perf_counter() - start, 3)}
+
+
+def run_batch(path, output="-", workers=4, top=15, hops=1, full_library=False, rebuild=False, offline=False):
+    """Run profiles and recommendations for every user in a file, writing one JSON line per user
+    as each finishes. A user that fails gets an error line instead of stopping the batch."""
+    utils.show_progress = False
+    config.ask_for_key = False  # Worker threads can't prompt: a missing key fails the run here instead
+    if not offline:
+        try:
+            config.get_steam_key()
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    names = read_user_list(path)
+    steam_ids = resolve_all(names)
+    click.secho(f"Processing {len(names)} users with {workers} workers...", fg="cyan", err=True)
+
+    failed = 0
+    with click.open_file(output, "w", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        def write(result):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+        futures = {}
+        for name in names:
+            if steam_ids[name]:
+                futures[pool.submit(process_user, name, steam_ids[name], top, hops, full_library, rebuild, offline)] = name
+            else:
+                failed += 1
+                write({"user": name, "steamid": None, "error": "Could not resolve Steam ID"})
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            name = futures[future]
+            try:
+                write(future.result())
+            except Exception as e:  # Anything one user hits is recorded for that user only
+                failed += 1
+                write({"user": name, "steamid": steam_ids[name], "error": f"{type(e).__name__}: {e}"})
+            click.secho(f"  {done}/{len(futures)} {name}", fg="white", err=True)
+
+    click.secho(f"✅ Batch finished: {len(names) - failed} succeeded, {failed} failed.", fg="green", err=True)
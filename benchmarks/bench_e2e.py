@@ -0,0 +1,181 @@
+"""Times the main Steam Soup operations end to end against the local stand-in server.
+
+Run from the repo root:
+    python benchmarks/bench_e2e.py --runs 5 --latency 0.05 --error-rate 0.02
+    python benchmarks/bench_e2e.py --compare bench_e2e.json   # diff against an earlier result file
+"""
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from standin import StandInServer  # noqa: E402
+
+OPERATIONS = ["fetch_user_data", "generate_game_recommendations", "get_player_news", "get_player_statistics"]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))]
+
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes, Linux KiB
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def reset_state(workdir):
+    """Point the app at fresh caches and a fresh HTTP client, as a cold process would see."""
+    import cache
+    import graph
+    import http_client
+    import profile_store
+    import tag_index
+
+    os.chdir(workdir)
+    cache.get_metadata_cache.instance = cache.MetadataCache(os.path.join(workdir, "cache.db"))
+    cache.get_api_result_cache.instance = cache.ApiResultCache(os.path.join(workdir, "cache.db"))
+    graph.get_similarity_graph.instance = graph.SimilarityGraph(os.path.join(workdir, "cache.db"))
+    tag_index.get_tag_index.instance = tag_index.InvertedTagIndex(os.path.join(workdir, "cache.db"))
+    profile_store.get_profile_store.instance = profile_store.ProfileStore(os.path.join(workdir, "profiles.db"))
+    http_client.get_client.instance = None
+
+
+def clear_profiles():
+    from profile_store import get_profile_store
+
+    store = get_profile_store()
+    for steamid, _, _ in store.list_profiles():
+        store.delete(steamid)
+
+
+def run_once(server, username):
+    """One full session; returns {operation: (seconds, server requests, bytes)}."""
+    from cli_helpers import fetch_user_data, generate_game_recommendations, get_player_news, get_player_statistics
+    from steam_user import SteamUser
+
+    results = {}
+    user = None
+
+    def fetch():
+        nonlocal user
+        user = SteamUser(username)
+        fetch_user_data(user)
+
+    steps = {"fetch_user_data": fetch,
+             "generate_game_recommendations": lambda: generate_game_recommendations(user),
+             "get_player_news": lambda: get_player_news(user),
+             "get_player_statistics": lambda: get_player_statistics(user)}
+    for name in OPERATIONS:
+        server.reset_stats()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            steps[name]()
+        elapsed = time.perf_counter() - start
+        served = server.stats()
+        results[name] = (elapsed, served["requests"], served["bytes"])
+    return results
+
+
+def summarize(samples):
+    times = [sample[0] for sample in samples]
+    return {"runs": len(samples),
+            "p50_ms": round(percentile(times, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(times, 0.95) * 1000, 2),
+            "mean_ms": round(sum(times) / len(times) * 1000, 2),
+            "requests_per_run": round(sum(sample[1] for sample in samples) / len(samples), 1),
+            "bytes_per_run": round(sum(sample[2] for sample in samples) / len(samples))}
+
+
+def compare(old_path, new):
+    with open(old_path) as f:
+        old = json.load(f)
+    click.secho(f"\nCompared with {old_path} ({old.get('commit')}):", bold=True)
+    for name in OPERATIONS:
+        before, after = old["operations"].get(name), new["operations"].get(name)
+        if not before or not after:
+            continue
+        for metric in ("p50_ms", "p95_ms", "requests_per_run"):
+            change = (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            colour = "red" if change > 5 else "green" if change < -5 else "white"
+            click.secho(f"  {name:<32}{metric:<18}{before[metric]:>10} → {after[metric]:<10}{change:+7.1f}%",
+                        fg=colour)
+
+
+@click.command()
+@click.option("--runs", default=5, show_default=True, help="Full sessions to time.")
+@click.option("--username", default="benchuser", show_default=True, help="Vanity name to resolve.")
+@click.option("--latency", default=0.02, show_default=True, help="Seconds added to every response.")
+@click.option("--jitter", default=0.01, show_default=True, help="Extra random seconds added per response.")
+@click.option("--error-rate", default=0.0, show_default=True, help="Fraction of responses that fail with 503.")
+@click.option("--library-size", default=200, show_default=True, help="Games in the stand-in user's library.")
+@click.option("--page-kb", default=400, show_default=True, help="Size of generated store pages.")
+@click.option("--rate-limit", type=float, help="Override STEAM_SOUP_RATE_LIMIT (0 disables it).")
+@click.option("--warm", is_flag=True, help="Keep caches and connections between runs.")
+@click.option("--output", default="bench_e2e.json", show_default=True, help="Where to write the results.")
+@click.option("--compare", "compare_path", type=click.Path(exists=True), help="Earlier result file to diff against.")
+def main(runs, username, latency, jitter, error_rate, library_size, page_kb, rate_limit, warm, output,
+         compare_path):
+    output = os.path.abspath(output)
+    compare_path = compare_path and os.path.abspath(compare_path)
+    server = StandInServer(latency=latency, jitter=jitter, error_rate=error_rate, library_size=library_size,
+                           page_kb=page_kb).start()
+    os.environ.update({"STEAM_KEY": "standin", "STEAM_STORE_URL": server.url, "STEAM_API_URL": server.url})
+    if rate_limit is not None:
+        os.environ["STEAM_SOUP_RATE_LIMIT"] = str(rate_limit)
+
+    samples = {name: [] for name in OPERATIONS}
+    with tempfile.TemporaryDirectory() as workdir:
+        for run in range(runs):
+            if run == 0 or not warm:
+                run_dir = os.path.join(workdir, f"run{run}")
+                os.makedirs(run_dir)
+                reset_state(run_dir)
+            else:
+                clear_profiles()  # Warm runs still rebuild the profile, from the shared caches
+            for name, sample in run_once(server, username).items():
+                samples[name].append(sample)
+            click.echo(f"run {run + 1}/{runs}: " + ", ".join(
+                f"{name} {samples[name][-1][0] * 1000:.0f}ms" for name in OPERATIONS))
+        os.chdir(os.path.dirname(output))
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {"runs": runs, "latency": latency, "jitter": jitter, "error_rate": error_rate,
+                   "library_size": library_size, "page_kb": page_kb, "rate_limit": rate_limit, "warm": warm},
+        "operations": {name: summarize(samples[name]) for name in OPERATIONS},
+        "peak_rss_kb": peak_rss_kb(),
+    }
+    server.shutdown()
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=4)
+    click.secho(f"\n{'operation':<32}{'p50 ms':>10}{'p95 ms':>10}{'requests':>10}", bold=True)
+    for name, summary in result["operations"].items():
+        click.echo(f"{name:<32}{summary['p50_ms']:>10}{summary['p95_ms']:>10}{summary['requests_per_run']:>10}")
+    click.echo(f"peak RSS {result['peak_rss_kb'] / 1024:.1f} MiB — results written to {output}")
+
+    if compare_path:
+        compare(compare_path, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compares the targeted extract.py parsers with a full BeautifulSoup parse of the same store pages.
+
+Run from the repo root:
+    python benchmarks/bench_extract.py                  # benchmark every page in benchmarks/fixtures
+    python benchmarks/bench_extract.py --record 620 570 # save live store pages as new fixtures
+"""
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+import click
+import requests
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extract import parse_game_page, parse_similar_games  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def soup_game_page(content):
+    """The full-tree parse get_game_info used before extract.py."""
+    soup = BeautifulSoup(content, "html.parser")
+    game_genres = soup.find('div', attrs={'id': 'genresAndManufacturer'})
+    game_name = soup.find('div', attrs={'id': 'appHubAppName_responsive'}).text
+    genres = [genre.text.strip() for genre in game_genres.find_all('span')]
+    tags = [tag.text.strip() for tag in soup.find_all('a', attrs={'class': 'app_tag'})]
+    return game_name, genres, tags
+
+
+def soup_similar_games(content):
+    """The full-tree parse new_games used before extract.py."""
+    soup = BeautifulSoup(content, "html.parser")
+    return [int(game['data-ds-appid']) for game in soup.find_all('a', attrs={'class': 'similar_grid_capsule'})[0:9]]
+
+
+def measure(parse, pages, repeat):
+    """CPU seconds per page and peak traced memory (KiB) for parsing every page."""
+    start = time.process_time()
+    for _ in range(repeat):
+        for content in pages:
+            parse(content)
+    cpu = (time.process_time() - start) / (repeat * len(pages))
+
+    tracemalloc.start()
+    for content in pages:
+        parse(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return cpu, peak / 1024
+
+
+def record(app_ids):
+    for app_id in app_ids:
+        for name, url in ((f"app_{app_id}", f"https://store.steampowered.com/app/{app_id}/"),
+                          (f"morelike_{app_id}", f"https://store.steampowered.com/recommended/morelike/app/{app_id}/")):
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+            with open(os.path.join(FIXTURES, f"{name}.html"), "wb") as f:
+                f.write(response.content)
+            click.secho(f"Saved {name}.html ({len(response.content) // 1024} KiB)", fg="green")
+
+
+@click.command()
+@click.option("--repeat", default=20, show_default=True, help="Parses of each page per timing run.")
+@click.option("--record", "record_ids", multiple=True, type=int, help="Save live store pages for an app ID.")
+def main(repeat, record_ids):
+    if record_ids:
+        record(record_ids)
+        return
+
+    rows = []
+    for kind, full, targeted in (("app", soup_game_page, parse_game_page),
+                                 ("morelike", soup_similar_games, parse_similar_games)):
+        pages = [open(path, "rb").read() for path in sorted(glob.glob(os.path.join(FIXTURES, f"{kind}_*.html")))]
+        if not pages:
+            continue
+        for content in pages:
+            assert full(content) == targeted(content), f"{kind} page parsed differently"
+        full_cpu, full_peak = measure(full, pages, repeat)
+        targeted_cpu, targeted_peak = measure(targeted, pages, repeat)
+        rows.append((kind, len(pages), full_cpu, targeted_cpu, full_peak, targeted_peak))
+
+    click.secho(f"{'page':<10}{'n':>3}{'soup ms':>10}{'extract ms':>12}{'speedup':>9}"
+                f"{'soup KiB':>11}{'extract KiB':>13}", bold=True)
+    for kind, count, full_cpu, targeted_cpu, full_peak, targeted_peak in rows:
+        click.echo(f"{kind:<10}{count:>3}{full_cpu * 1000:>10.2f}{targeted_cpu * 1000:>12.2f}"
+                   f"{full_cpu / targeted_cpu:>8.1f}x{full_peak:>11.0f}{targeted_peak:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
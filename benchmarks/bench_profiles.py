@@ -0,0 +1,98 @@
+"""Compares scanning saved profiles stored as the old per-user JSON files with the profile store.
+
+Run from the repo root:
+    python benchmarks/bench_profiles.py --profiles 2000
+"""
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from profile_store import ProfileStore  # noqa: E402
+from records import Game  # noqa: E402
+
+TAGS = [f"Tag {n}" for n in range(400)]
+GENRES = ["Action", "Adventure", "Indie", "RPG", "Strategy", "Simulation"]
+
+
+def fake_profiles(count, top, seed=0):
+    rng = random.Random(seed)
+    for n in range(count):
+        games = [Game(rng.randrange(10, 3_000_000), f"Game {n}-{key}", f"https://store/app/{key}/",
+                      rng.randrange(60, 100_000), rng.sample(TAGS, 20), rng.sample(GENRES, 2), time.time(), key)
+                 for key in range(top)]
+        yield str(76561197960265728 + n), f"user{n}", {tag: rng.randrange(1, top) for tag in rng.sample(TAGS, 10)}, games
+
+
+def write_json(workdir, profiles):
+    for steamid, username, top_tags, games in profiles:
+        with open(os.path.join(workdir, f"{steamid}_user_info.json"), "w", encoding="utf-8") as f:
+            json.dump({"user": username, "id": steamid, "top_tags": top_tags,
+                       "top_games": [game.as_dict() for game in games], "saved_at": time.time()}, f, indent=4)
+
+
+def scan_json(workdir):
+    """What get_saved_users used to do: glob every file and parse it."""
+    users = []
+    for path in glob.glob(os.path.join(workdir, "*_user_info.json")):
+        with open(path, "r") as f:
+            users.append(json.load(f))
+    return users
+
+
+def measure(func, repeat=3):
+    """(best seconds of `repeat` calls, peak bytes allocated by one); timed separately since tracing slows it down."""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+@click.command()
+@click.option("--profiles", default=2000, show_default=True, help="Saved profiles to generate.")
+@click.option("--top", default=15, show_default=True, help="Top games per profile.")
+def main(profiles, top):
+    with tempfile.TemporaryDirectory() as workdir:
+        write_json(workdir, fake_profiles(profiles, top))
+        store = ProfileStore(os.path.join(workdir, "profiles.db"))
+        for steamid, username, top_tags, games in fake_profiles(profiles, top):
+            store.save_profile(steamid, username, top_tags, games)
+
+        json_bytes = sum(os.path.getsize(path) for path in glob.glob(os.path.join(workdir, "*.json")))
+        store_bytes = os.path.getsize(os.path.join(workdir, "profiles.db"))
+
+        def fresh_store():  # Nothing decoded yet, as in a new process
+            return ProfileStore(os.path.join(workdir, "profiles.db"))
+
+        rows = [
+            ("JSON glob + parse", *measure(lambda: scan_json(workdir)), json_bytes),
+            ("store list_profiles", *measure(store.list_profiles), store_bytes),
+            ("store load_profiles", *measure(lambda: fresh_store().load_profiles()), store_bytes),
+            ("store load_profile each",
+             *measure(lambda: [cold.load_profile(steamid) for cold in [fresh_store()]
+                               for steamid, _, _ in cold.list_profiles()]),
+             store_bytes),
+            ("store load_profiles, warm", *measure(store.load_profiles), store_bytes),
+        ]
+
+    click.echo(f"{profiles} profiles of {top} games")
+    click.echo(f"{'scan':<28}{'ms':>10}{'peak KiB':>12}{'on disk KiB':>14}")
+    for name, elapsed, peak, size in rows:
+        click.echo(f"{name:<28}{elapsed * 1000:>10.1f}{peak // 1024:>12}{size // 1024:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Measures cold start: importing cli, and launching steam_soup.py for a saved user until the menu shows.
+
+Run from the repo root:
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --budget-ms 150   # exit 1 if the menu takes longer than this
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["requests", "numpy", "bs4", "tabulate", "webbrowser"]
+MENU_MARKER = "What would you like to do?"
+STEAM_ID = "76561197960287930"
+
+IMPORT_PROBE = f"""
+import json, sys, time
+sys.path.insert(0, {REPO!r})
+start = time.perf_counter()
+import cli
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                  "heavy": [name for name in {HEAVY_MODULES!r} if name in sys.modules]}}))
+"""
+
+SEED_PROFILE = f"""
+import sys
+sys.path.insert(0, {REPO!r})
+from profile_store import ProfileStore
+from records import Game
+games = [Game(620 + n, f"Game {{n}}", "", 600 - n, ["Puzzle", "Co-op", "Singleplayer"], ["Action"], key=n)
+         for n in range(15)]
+ProfileStore().save_profile({STEAM_ID!r}, "startup_bench", {{"Puzzle": 3, "Co-op": 2, "Singleplayer": 2}}, games)
+"""
+
+
+def clean_env():
+    """No API key and no network settings: a cached lookup must not need either."""
+    env = {key: value for key, value in os.environ.items() if key != "STEAM_KEY"}
+    env["PYTHONUNBUFFERED"] = "1"
+    return env
+
+
+def time_import():
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True, check=True,
+                            env=clean_env()).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def time_first_menu(workdir):
+    """Seconds from launching the interpreter to the menu being printed for a saved user."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(REPO, "steam_soup.py"), STEAM_ID], cwd=workdir,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                               env=clean_env())
+    try:
+        for line in process.stdout:
+            if MENU_MARKER in line:
+                elapsed = time.perf_counter() - start
+                process.communicate("5\n", timeout=10)  # Exit from the menu
+                return elapsed
+        raise RuntimeError("steam_soup.py exited before showing the menu")
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+def summarize(values):
+    return {"median_ms": round(statistics.median(values) * 1000, 2), "min_ms": round(min(values) * 1000, 2),
+            "max_ms": round(max(values) * 1000, 2)}
+
+
+@click.command()
+@click.option("--runs", default=10, show_default=True, help="Cold starts to time for each measurement.")
+@click.option("--output", default="bench_startup.json", show_default=True, help="Where to write the results.")
+@click.option("--budget-ms", type=float, help="Fail if the median time to the menu is above this.")
+def main(runs, output, budget_ms):
+    imports = [time_import() for _ in range(runs)]
+    with tempfile.TemporaryDirectory() as workdir:
+        subprocess.run([sys.executable, "-c", SEED_PROFILE], cwd=workdir, check=True, env=clean_env())
+        menus = [time_first_menu(workdir) for _ in range(runs)]
+
+    result = {"runs": runs,
+              "import_cli": summarize([probe["seconds"] for probe in imports]),
+              "heavy_modules_on_import": imports[-1]["heavy"],
+              "first_menu": summarize(menus)}
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=4)
+
+    click.echo(f"import cli:        median {result['import_cli']['median_ms']} ms")
+    click.echo(f"first menu render: median {result['first_menu']['median_ms']} ms")
+    click.echo(f"heavy modules loaded by import: {', '.join(result['heavy_modules_on_import']) or 'none'}")
+    if budget_ms is not None and result["first_menu"]["median_ms"] > budget_ms:
+        click.secho(f"❌ Over the {budget_ms} ms budget", fg="red")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
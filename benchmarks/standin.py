@@ -0,0 +1,209 @@
+"""A local stand-in for the Steam store and Web API, used by the offline benchmarks.
+
+Store pages are served from benchmarks/fixtures when a recording exists for the app and are
+otherwise generated from the app ID, so every app has stable tags, similar games and news.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+TAG_POOL = ["Action", "Adventure", "RPG", "Strategy", "Simulation", "Indie", "Casual", "Puzzle", "Platformer",
+            "Shooter", "FPS", "Roguelike", "Roguelite", "Survival", "Open World", "Sandbox", "Crafting",
+            "Story Rich", "Atmospheric", "Great Soundtrack", "Singleplayer", "Multiplayer", "Co-op",
+            "Online Co-Op", "PvP", "Horror", "Sci-fi", "Fantasy", "Pixel Graphics", "2D", "3D", "Anime",
+            "Turn-Based", "Tactical", "Card Game", "Deckbuilding", "City Builder", "Management", "Racing",
+            "Sports", "Fighting", "Stealth", "Metroidvania", "Souls-like", "Difficult", "Relaxing", "Cute",
+            "Funny", "Dark", "Exploration", "Physics", "Building", "Space", "Zombies", "Post-apocalyptic",
+            "Military", "Historical", "Farming Sim", "Life Sim", "Visual Novel"]
+GENRE_POOL = ["Action", "Adventure", "Casual", "Indie", "RPG", "Simulation", "Strategy", "Racing", "Sports"]
+APP_ID_SPACE = 2000  # Generated similar games are drawn from app IDs 10 .. 10 * APP_ID_SPACE
+FILLER = "<div class=\"review_box\"><div class=\"content\">Filler review text &amp; <b>markup</b>.</div></div>\n"
+
+
+def app_rng(app_id, salt=""):
+    return random.Random(f"{app_id}{salt}")
+
+
+def recorded(name):
+    path = os.path.join(FIXTURES, f"{name}.html")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return None
+
+
+def app_page(app_id, page_kb):
+    rng = app_rng(app_id)
+    tags = rng.sample(TAG_POOL, 20)
+    genres = ", ".join(f'<a href="/genre/{genre}/">{genre}</a>' for genre in rng.sample(GENRE_POOL, 2))
+    tag_links = "\n".join(f'<a href="/tags/en/{tag}/" class="app_tag" style="display: none;">\n\t{tag}\t</a>'
+                          for tag in tags)
+    filler = FILLER * (page_kb * 1024 // len(FILLER) // 2)
+    return f"""<!DOCTYPE html><html><head><title>Game {app_id} on Steam</title></head><body>
+{filler}
+<div id="appHubAppName_responsive" style="display: none;" class="apphub_AppName">Game {app_id}</div>
+<div class="glance_tags popular_tags" data-appid="{app_id}">
+{tag_links}
+<div class="app_tag add_button">+</div>
+</div>
+<div id="genresAndManufacturer" class="details_block"><b>Genre:</b> <span>{genres}</span><br></div>
+{filler}
+</body></html>""".encode()
+
+
+def app_details(app_id):
+    """The appdetails JSON for a generated app, with the same title and genres as its store page."""
+    rng = app_rng(app_id)
+    rng.sample(TAG_POOL, 20)  # Same draws as app_page, so the genres match
+    genres = rng.sample(GENRE_POOL, 2)
+    return {str(app_id): {"success": True, "data": {
+        "type": "game", "name": f"Game {app_id}", "steam_appid": app_id, "is_free": False,
+        "short_description": "A generated game. " * 10,
+        "genres": [{"id": str(GENRE_POOL.index(genre) + 1), "description": genre} for genre in genres]}}}
+
+
+def morelike_page(app_id, page_kb):
+    rng = app_rng(app_id, "morelike")
+    similar = rng.sample(range(1, APP_ID_SPACE), 12)
+    capsules = "\n".join(f'<a class="similar_grid_capsule" href="/app/{s * 10}/" data-ds-appid="{s * 10}">'
+                         f'<img src="/capsule_{s * 10}.jpg"></a>' for s in similar)
+    filler = FILLER * (page_kb * 1024 // len(FILLER) // 4)
+    return f"""<!DOCTYPE html><html><head><title>Steam Store</title></head><body>
+{filler}<div class="similar_grid">
+{capsules}
+</div>{filler}</body></html>""".encode()
+
+
+def owned_games(steam_id, library_size):
+    rng = app_rng(steam_id, "library")
+    app_ids = rng.sample(range(1, APP_ID_SPACE), library_size)
+    return {"response": {"game_count": library_size, "games": [
+        {"appid": app_id * 10, "playtime_forever": int(rng.paretovariate(1.2) * 60)} for app_id in app_ids]}}
+
+
+def achievements(steam_id, app_id):
+    rng = app_rng(app_id, steam_id)
+    if rng.random() < 0.2:
+        return None  # Games without achievements answer 400
+    return {"playerstats": {"steamID": steam_id, "success": True, "achievements": [
+        {"apiname": f"ACH_{n}", "achieved": int(rng.random() < 0.5)} for n in range(rng.randint(5, 60))]}}
+
+
+def news(app_id):
+    return {"appnews": {"appid": app_id, "newsitems": [
+        {"title": f"Game {app_id} update {n}", "url": f"https://example.invalid/news/{app_id}/{n}",
+         "contents": "Patch notes " * 20} for n in range(3)]}}
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Serves the store and API routes the app uses, with injected latency and errors."""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, error_rate=0.0, library_size=200, page_kb=400, seed=0):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.library_size = library_size
+        self.page_kb = page_kb
+        self.rng = random.Random(seed)
+        self.counts = Counter()
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stats(self):
+        with self.lock:
+            return {"requests": sum(self.counts.values()), "by_route": dict(self.counts), "bytes": self.bytes_sent}
+
+    def reset_stats(self):
+        with self.lock:
+            self.counts.clear()
+            self.bytes_sent = 0
+
+
+ROUTES = [
+    ("store_app", re.compile(r"^/app/(\d+)/?$")),
+    ("store_morelike", re.compile(r"^/recommended/morelike/app/(\d+)/?$")),
+    ("store_appdetails", re.compile(r"^/api/appdetails/?$")),
+    ("resolve_vanity", re.compile(r"^/ISteamUser/ResolveVanityURL/")),
+    ("owned_games", re.compile(r"^/IPlayerService/GetOwnedGames/")),
+    ("achievements", re.compile(r"^/ISteamUserStats/GetPlayerAchievements/")),
+    ("news", re.compile(r"^/ISteamNews/GetNewsForApp/")),
+]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real hosts
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        route, match = next(((name, pattern.match(url.path)) for name, pattern in ROUTES
+                             if pattern.match(url.path)), (None, None))
+        with server.lock:
+            server.counts[route or "unknown"] += 1
+            fail = server.rng.random() < server.error_rate
+            delay = server.latency + server.rng.uniform(0, server.jitter)
+
+        if delay:
+            time.sleep(delay)
+        if route is None:
+            return self.send(404, {"error": "unknown route"})
+        if fail:
+            return self.send(503, {"error": "injected failure"})
+
+        if route == "store_app":
+            app_id = int(match.group(1))
+            self.send(200, recorded(f"app_{app_id}") or app_page(app_id, server.page_kb), "text/html; charset=UTF-8")
+        elif route == "store_morelike":
+            app_id = int(match.group(1))
+            self.send(200, recorded(f"morelike_{app_id}") or morelike_page(app_id, server.page_kb),
+                      "text/html; charset=UTF-8")
+        elif route == "store_appdetails":
+            self.send(200, app_details(int(query.get("appids", 0))))
+        elif route == "resolve_vanity":
+            vanity = query.get("vanityurl", "")
+            steam_id = str(76561197960265728 + sum(vanity.encode()) * 7919)
+            self.send(200, {"response": {"steamid": steam_id, "success": 1}})
+        elif route == "owned_games":
+            self.send(200, owned_games(query.get("steamid", ""), server.library_size))
+        elif route == "achievements":
+            stats = achievements(query.get("steamid", ""), int(query.get("appid", 0)))
+            if stats is None:
+                self.send(400, {"playerstats": {"error": "Requested app has no stats", "success": False}})
+            else:
+                self.send(200, stats)
+        elif route == "news":
+            self.send(200, news(int(query.get("appid", 0))))
@@ -0,0 +1,188 @@
+import json
+import time
+from dataclasses import replace
+
+import instrument
+from config import ACHIEVEMENTS_TTL, CACHE_PATH, METADATA_TTL, NEWS_TTL, VANITY_TTL
+from db import connect
+from records import Game
+from utils import LRUCache, Shared
+
+MEMORY_ENTRIES = 20000  # Games kept in memory per cache
+
+
+class MetadataCache:
+    """Local SQLite store of game metadata shared by every user, keyed by appid.
+    Complete entries (with user tags) live in `games`; title and genres alone, from lighter
+    sources, live in `app_details` so they never stand in for an entry that needs tags."""
+
+    def __init__(self, path=CACHE_PATH, ttl=METADATA_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory = LRUCache(MEMORY_ENTRIES)  # Recently used complete entries, so warm lookups skip SQLite
+        self._db = connect(path)  # One connection per file, shared with the other stores in it
+        self._lock, self._conn = self._db.lock, self._db.conn
+        with self._lock:
+            self.create_tables()
+
+    def create_tables(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS games (
+                appid INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                tags TEXT NOT NULL,
+                genres TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS app_details (
+                appid INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                genres TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )""")
+        self._conn.commit()
+
+    def get(self, appid, tags=True):
+        """Return the cached metadata for an app, or None if it is missing or older than the TTL.
+        With tags=False an entry without user tags is good enough."""
+        appid = int(appid)
+        game = self._memory.get(appid)
+        with self._lock:
+            if game is None or time.time() - game.fetched_at > self.ttl:
+                game = None
+                row = self._conn.execute(
+                    "SELECT title, url, tags, genres, fetched_at FROM games WHERE appid = ?", (appid,)).fetchone()
+                complete = bool(row) and time.time() - row[4] <= self.ttl
+                if not complete and not tags:
+                    row = self._conn.execute(
+                        "SELECT title, url, '[]', genres, fetched_at FROM app_details WHERE appid = ?", (appid,)
+                    ).fetchone()
+                if row and time.time() - row[4] <= self.ttl:
+                    title, url, tag_list, genres, fetched_at = row
+                    game = Game(appid, title, url, tags=json.loads(tag_list), genres=json.loads(genres),
+                                fetched_at=fetched_at)
+                    if complete:
+                        self._memory.put(appid, game)
+            if game is None:
+                self.misses += 1
+                instrument.add("cache_misses")
+                return None
+            self.hits += 1
+            instrument.add("cache_hits")
+        return game
+
+    def put(self, game, tags=True):
+        """Store (or refresh) the metadata of a game; tags=False for metadata fetched without user tags."""
+        with self._lock:
+            if tags:
+                self._memory.put(int(game['id']), replace(game, time=0, key=0))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO games (appid, title, url, tags, genres, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (int(game['id']), game['title'], game['url'], json.dumps(list(game['tags'])),
+                     json.dumps(list(game['genres'])), game.get('fetched_at', time.time())))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO app_details (appid, title, url, genres, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                    (int(game['id']), game['title'], game['url'], json.dumps(list(game['genres'])),
+                     game.get('fetched_at', time.time())))
+            self._conn.commit()
+
+    def get_many(self, appids):
+        """Complete entries for many apps at once, stale ones included: for offline use, old data beats none."""
+        appids = [int(appid) for appid in appids]
+        found = {}
+        with self._lock:
+            rows = self._db.select_in("SELECT appid, title, url, tags, genres, fetched_at FROM games "
+                                      "WHERE appid IN ({})", appids)
+        return {appid: Game(appid, title, url, tags=json.loads(tags), genres=json.loads(genres), fetched_at=fetched_at)
+                for appid, title, url, tags, genres, fetched_at in rows}
+
+    def all_tags(self):
+        """(appid, tags) of every complete entry."""
+        with self._lock:
+            rows = self._conn.execute("SELECT appid, tags FROM games").fetchall()
+        return [(appid, json.loads(tags)) for appid, tags in rows]
+
+    def stats(self):
+        """Hit/miss counts since this cache was opened."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0}
+
+
+class ApiResultCache:
+    """Per-user, per-app Steam API results (achievements, news), each kind with its own TTL,
+    plus resolved vanity names."""
+
+    def __init__(self, path=CACHE_PATH, ttls=None):
+        self.path = path
+        self.ttls = ttls or {"achievements": ACHIEVEMENTS_TTL, "news": NEWS_TTL, "vanity": VANITY_TTL}
+        self._db = connect(path)  # One connection per file, shared with the other stores in it
+        self._lock, self._conn = self._db.lock, self._db.conn
+        with self._lock:
+            self.create_tables()
+
+    def create_tables(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS api_results (
+                kind TEXT NOT NULL,
+                steamid TEXT NOT NULL,
+                appid INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (kind, steamid, appid)
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS vanity_names (
+                name TEXT PRIMARY KEY,
+                steamid TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )""")
+        self._conn.commit()
+
+    def get(self, kind, steamid, appid):
+        """Return the cached result, or None if it is missing or older than the TTL for its kind."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, fetched_at FROM api_results WHERE kind = ? AND steamid = ? AND appid = ?",
+                (kind, str(steamid), int(appid))).fetchone()
+        if not row or time.time() - row[1] > self.ttls[kind]:
+            instrument.add(f"{kind}_cache_misses")
+            return None
+        instrument.add(f"{kind}_cache_hits")
+        return json.loads(row[0])
+
+    def put(self, kind, steamid, appid, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO api_results (kind, steamid, appid, payload, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, str(steamid), int(appid), json.dumps(result), time.time()))
+            self._conn.commit()
+
+    def get_steam_id(self, name):
+        """The Steam ID a vanity name resolved to, or None if unknown or older than the TTL."""
+        with self._lock:
+            row = self._conn.execute("SELECT steamid, fetched_at FROM vanity_names WHERE name = ?",
+                                     (name.lower(),)).fetchone()
+        if not row or time.time() - row[1] > self.ttls["vanity"]:
+            instrument.add("vanity_cache_misses")
+            return None
+        instrument.add("vanity_cache_hits")
+        return row[0]
+
+    def put_steam_id(self, name, steamid):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO vanity_names (name, steamid, fetched_at) VALUES (?, ?, ?)",
+                               (name.lower(), str(steamid), time.time()))
+            self._conn.commit()
+
+
+get_metadata_cache = Shared(MetadataCache)  # The shared metadata cache, opened on first use
+get_api_result_cache = Shared(ApiResultCache)  # The shared API result cache, opened on first use
@@ -1,18 +1,64 @@
-import os
+import atexit
 
 import click
 
-from cli_helpers import fetch_user_data, generate_game_recommendations, display_top_games,get_saved_users,welcome_message,display_menu,get_player_news,get_player_statistics
+import instrument
+from config import check_metadata_sources
+
+from cli_helpers import fetch_user_data, generate_game_recommendations, display_top_games,get_saved_users,welcome_message,display_menu,get_player_news,get_player_statistics,refresh_user_data,start_prefetch
 from steam_user import SteamUser
 
 
 @click.command()
 @click.argument("username", required=False)
 @click.option("--clear-cache", is_flag=True, help="Delete cached user data and fetch fresh data")
+@click.option("--refresh", is_flag=True, help="Update cached user data with only what changed on Steam")
+@click.option("--full-library", is_flag=True, help="Tally tags over your whole played library, not just your top games")
+@click.option("--top", default=15, show_default=True, help="Number of most played games to keep as your top games")
+@click.option("--hops", default=1, show_default=True, help="Steps through the similar games graph when finding recommendations")
+@click.option("--profile", "profile_path", type=click.Path(dir_okay=False),
+              help="Write per-stage timing, network, parsing and cache numbers to this JSON file on exit")
+@click.option("--cprofile", "cprofile_stage", metavar="STAGE",
+              help="Run one stage (e.g. get_game_info, top_new_games) under cProfile and save STAGE.prof")
+@click.option("--batch", "batch_path", type=click.Path(exists=True, dir_okay=False),
+              help="Non-interactive: get recommendations for every username or Steam ID in this file")
+@click.option("--output", default="-", show_default=True, help="Where --batch writes its JSON lines (- for stdout)")
+@click.option("--batch-workers", default=4, show_default=True, help="Users processed at once in --batch mode")
+@click.option("--time-budget", type=float, metavar="SECONDS",
+              help="Stop looking for recommendations after this long and rank what was found")
+@click.option("--stable-after", default=0, metavar="N",
+              help="Stop looking for recommendations once N games in a row haven't changed the top list (0 never stops early)")
+@click.option("--offline", is_flag=True, help="Recommend from games already scraped, without any network calls")
+@click.option("--prefetch", is_flag=True, help="Get recommendations, news and achievements in the background while the menu is open")
+@click.option("--export-json", is_flag=True, help="Also write your saved data and recommendations to JSON files")
+@click.option("--serve", is_flag=True, help="Run the local service that keeps caches warm for --service clients")
+@click.option("--service", "service_url", envvar="STEAM_SOUP_SERVICE", metavar="URL",
+              help="Use a running service (e.g. http://127.0.0.1:8765) instead of doing the work in this process")
 @click.option("--top-games-tags", is_flag=True, help="View your most played games and tags from your steam library.")
 @click.option("--game-recs", is_flag=True, help="Retrieve game recommendations based on your steam data")
-def main(username, clear_cache, game_recs, top_games_tags):
+def main(username, clear_cache, refresh, full_library, top, hops, profile_path, cprofile_stage, batch_path, output,
+         batch_workers, time_budget, stable_after, offline, prefetch, export_json, serve, service_url, game_recs, top_games_tags):
     """Main CLI function to fetch and display Steam user data."""
+    try:
+        check_metadata_sources()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    instrument.profile_stage = cprofile_stage
+    if profile_path:
+        atexit.register(write_profile, profile_path)
+
+    if batch_path:
+        from batch import run_batch
+
+        run_batch(batch_path, output, batch_workers, top, hops, full_library, rebuild=clear_cache, offline=offline)
+        return
+
+    if serve:
+        from service import serve as run_service
+
+        run_service()
+        return
+
     welcome_message()
 
     if not username:
@@ -22,7 +68,12 @@ def main(username, clear_cache, game_recs, top_games_tags):
     if not username:
         username = click.prompt("Enter your Steam username or ID")
 
+    # Thin client: the service does the work and keeps its caches between runs
+    if service_url:
+        from client import run_client
 
+        run_client(service_url, username, top, hops, full_library, clear_cache, offline, game_recs, top_games_tags)
+        return
 
     user = SteamUser(username)
 
@@ -31,36 +82,63 @@ def main(username, clear_cache, game_recs, top_games_tags):
         click.secho("❌ Error: Could not resolve Steam ID. Check the username.", fg="red", bold=True)
         return
 
-    # Clears Json data if clear cache is requested
-    if clear_cache and os.path.exists(user.user_file_path):
+    if offline and (clear_cache or refresh or not user.has_saved_data()):
+        click.secho("❌ Error: --offline needs saved user data, without --clear-cache or --refresh.", fg="red", bold=True)
+        return
+
+    # Clears saved data if clear cache is requested
+    if clear_cache and user.has_saved_data():
         user.clear_cache()
 
-    # Fetch user data from json or from Steam Api
-    fetch_user_data(user)
-
-    # Display most played games and tags if requested
-    if top_games_tags:
-        display_top_games(user)
-
-    # Generate and display game recommendations if requested
-    if game_recs:
-        generate_game_recommendations(user)
-
-
-    while True:
-        display_menu(user)
-        selection= int(click.prompt("Enter selection"))
-        if selection == 5:
-            click.secho("\n👋 Exiting Steam Soup. Have a great day! 🎮", fg="magenta", bold=True)
-            break
-        elif selection == 4:
-            get_player_statistics(user)
-        elif selection == 3:
-            get_player_news(user)
-        elif selection == 2:
-            generate_game_recommendations(user)
-        elif selection == 1:
-            display_top_games(user)
-        click.pause("\n⏳ Press Enter to continue...\n")  # Prevents auto-restarting instantly
+    # Fetch user data from json or from Steam Api, or bring saved data up to date
+    try:
+        if refresh:
+            refresh_user_data(user, top, full_library)
+        else:
+            fetch_user_data(user, top, full_library)
+    except ValueError as e:
+        click.secho(f"❌ Error: {e}", fg="red", bold=True)
+        return
+
+    # Write JSON copies of the saved data, and keep them up to date for the rest of the session
+    if export_json:
+        user.json_export = True
+        click.secho(f"📄 User data exported to {user.export_json()}", fg="white")
 
+    # Start menu options 2-4 in the background while the menu waits for input
+    prefetcher = start_prefetch(user, hops, offline) if prefetch else None
+    try:
+        # Display most played games and tags if requested
+        if top_games_tags:
+            display_top_games(user)
 
+        # Generate and display game recommendations if requested
+        if game_recs:
+            generate_game_recommendations(user, hops, prefetcher, offline, time_budget, stable_after)
+
+        while True:
+            display_menu(user)
+            selection= int(click.prompt("Enter selection"))
+            if selection == 5:
+                click.secho("\n👋 Exiting Steam Soup. Have a great day! 🎮", fg="magenta", bold=True)
+                break
+            elif selection == 4:
+                get_player_statistics(user, prefetcher)
+            elif selection == 3:
+                get_player_news(user, prefetcher)
+            elif selection == 2:
+                generate_game_recommendations(user, hops, prefetcher, offline, time_budget, stable_after)
+            elif selection == 1:
+                display_top_games(user)
+            click.pause("\n⏳ Press Enter to continue...\n")  # Prevents auto-restarting instantly
+    finally:
+        if prefetcher:
+            prefetcher.cancel()  # Don't keep the process alive for results nobody will see
+
+
+
+
+def write_profile(path):
+    """Save the --profile summary once the program exits, however it exits."""
+    instrument.write_summary(path)
+    click.secho(f"📊 Profile written to {path}", fg="white")
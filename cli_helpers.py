@@ -1,12 +1,15 @@
-import glob
-import json
-import os
+import time
+from dataclasses import replace
 
 import click
-from tabulate import tabulate
 
-from recommender import favorite_tags, top_new_games
-from scraper import get_game_info, new_games
+import instrument
+from config import METADATA_TTL, get_steam_key
+
+REDRAW_EVERY = 0.5  # Seconds between redraws of provisional recommendations
+
+# The scraping, scoring and table modules (and requests, numpy, tabulate behind them) are
+# imported inside the functions that use them, so showing the menu for a saved user stays fast
 
 
 def welcome_message():
@@ -36,37 +39,208 @@ def display_menu(user):
     click.secho("\n💡 Type the number of your choice and press Enter.", fg="white", bold=True)
 
 
-def fetch_user_data(user):
-    """Fetch and store user top played games and top tags if no json data is found"""
-    if os.path.exists(user.user_file_path):
+def fetch_user_data(user, top=15, full_library=False):
+    """Load saved user data, or fetch and store user top played games and top tags if there is none"""
+    if user.has_saved_data():
         user.use_saved_user()
     else:
-        click.secho(f"Fetching data for user: {user.username}...", fg="cyan")
-        user.get_owned_games()
+        build_user_data(user, top, full_library)
+
+
+def build_user_data(user, top=15, full_library=False):
+    """Fetch and store user top played games and top tags from Steam."""
+    click.secho(f"Fetching data for user: {user.username}...", fg="cyan")
+    collect_user_data(user, top, full_library)
+    click.secho("✅ Your information and top games have been recorded for later use.", fg="green")
+
+
+def collect_user_data(user, top=15, full_library=False):
+    """Fetch and store user top played games and top tags from Steam, without any output.
+    With full_library, tags are tallied over every played game instead of just the top ones."""
+    from library import stream_library
+    from recommender import favorite_tags
+    from scraper import get_game_info
+
+    if full_library:
+        user.get_owned_games(top=None)
+        played = [game for game in user.owned_games if game['time'] > 0]  # Unplayed games say nothing about taste
+        profile = stream_library(played, top=top, checkpoint_path=user.library_checkpoint_path,
+                                 label="Getting info on your whole library...")
+        user.top_games = profile.top_games
+        user.top_tags = profile.favorite_tags()
+    else:
+        user.get_owned_games(top=top)
         user.top_games = get_game_info(user.owned_games, label="Getting info on games list...")
         user.top_tags = favorite_tags(user.top_games)
-        click.secho("✅ Your information and top games have been recorded for later use.", fg="green")
-        user.save_user()
+    user.save_user()
+
 
+def refresh_user_data(user, top=15, full_library=False):
+    """Update saved user data with only what changed since it was saved:
+    new top games are scraped, the rest keep their saved info with their playtime updated."""
+    if full_library or not user.has_saved_data():
+        # A full library rebuild only scrapes what the metadata cache doesn't already have
+        return build_user_data(user, top, full_library)
+    from recommender import favorite_tags
+    from scraper import get_game_info
 
-def generate_game_recommendations(user):
-    """Find and display game recommendations based on user's top tags."""
-    new_game_suggestions = new_games(user.top_games, label="🔎 Finding games similar to your favorites...")
-    new_games_info = get_game_info(new_game_suggestions, label="📖 Getting info on game suggestions...")
+    user.use_saved_user()
+    saved_games = {game['id']: game for game in user.top_games}
+    saved_playtime = {game['id']: game.get('time', 0) for game in user.top_games}
+
+    try:
+        user.get_owned_games(top=top)
+    except ValueError as e:
+        click.secho(f"⚠️ Could not reach Steam ({e}), keeping your saved information.", fg="yellow")
+        return
+    if not user.owned_games:
+        click.secho("⚠️ Steam listed no games (is the profile private?), keeping your saved information.", fg="yellow")
+        return
+
+    # Only games new to the top list, or whose saved info has gone stale, need scraping
+    stale_before = time.time() - METADATA_TTL
+    to_fetch = [game for game in user.owned_games
+                if game['id'] not in saved_games or saved_games[game['id']].get('fetched_at', 0) < stale_before]
+    fetched = {}
+    if to_fetch:
+        try:
+            fetched = {game['id']: game for game in get_game_info(to_fetch, label="Getting info on new games...")}
+        except ValueError:
+            click.secho("⚠️ Could not get info on your new games, keeping your saved information.", fg="yellow")
+            return
+
+    top_games = []
+    for game in user.owned_games:
+        info = fetched.get(game['id']) or saved_games.get(game['id'])
+        if info:
+            top_games.append(replace(info, key=len(top_games), time=game['time']))
+
+    new_count = sum(1 for game in user.owned_games if game['id'] not in saved_games)
+    played_count = sum(1 for game in user.owned_games
+                       if game['id'] in saved_playtime and game['time'] != saved_playtime[game['id']])
+    user.top_games = top_games
+    user.top_tags = favorite_tags(user.top_games)
+    user.save_user()
+    click.secho(f"✅ Refreshed: {new_count} new top games, {played_count} with new playtime, "
+                f"{len(to_fetch)} store lookups.", fg="green")
+
+
+def recommend_games(user, hops=1, offline=False):
+    """Find game recommendations based on user's top tags, without any output.
+    With hops > 1, candidates also come from games similar to the similar games.
+    Offline, candidates come from every game scraped so far that shares the user's top tags."""
+    from recommender import top_new_games
+    from tag_index import get_tag_index
+
+    if offline:
+        from tag_index import offline_candidates
+
+        new_games_info = offline_candidates(user.top_games, user.top_tags)
+    else:
+        from scraper import get_game_info, new_games
+
+        new_game_suggestions = new_games(user.top_games, label="🔎 Finding games similar to your favorites...",
+                                         hops=hops)
+        new_games_info = get_game_info(new_game_suggestions, label="📖 Getting info on game suggestions...")
+    index = get_tag_index()  # Same IDF as the streamed rankings, so every path ranks alike
     user.user_recommendations = top_new_games(user.top_games, new_games_info, user.top_tags,
-                                              label="🎯 Sorting game suggestions...")
-    suggested_games_table = [[game['title'], "\n".join(game['tags'])] for game in user.user_recommendations]
-    click.secho("\n🕹️ Recommended Games for You:", fg="blue", bold=True)
+                                              label="🎯 Sorting game suggestions...",
+                                              document_frequency=index.document_frequencies(),
+                                              corpus_size=index.app_count())
+    return user.user_recommendations
+
+
+def start_prefetch(user, hops=1, offline=False):
+    """Start recommendations, news and achievements in the background, so the menu options
+    that show them only have to wait for whatever is still running. Offline, only recommendations."""
+    from prefetch import Prefetcher
+
+    if not offline:
+        get_steam_key()  # Ask for a missing key here: the background threads can't prompt
+    prefetcher = Prefetcher()
+    prefetcher.start("recommendations", recommend_games, user, hops, offline)
+    if not offline:
+        prefetcher.start("news", user.get_news)
+        prefetcher.start("statistics", user.get_statistics)
+    return prefetcher
+
+
+def stream_game_recommendations(user, hops=1, time_budget=None, stable_after=0):
+    """Find game recommendations while showing the best found so far as candidates come in.
+    Stops early once `time_budget` seconds have passed or `stable_after` candidates in a row
+    haven't changed the top list. The final list is the ranker's own top list, so what was shown
+    while streaming, and what --stable-after waited on, is what the user gets."""
+    from recommender import StreamingRanker
+    from scraper import stream_candidates
+    from tag_index import get_tag_index
+
+    index = get_tag_index()
+    ranker = StreamingRanker(user.top_games, user.top_tags, document_frequency=index.document_frequencies(),
+                             corpus_size=index.app_count())
+    start = time.perf_counter()
+    candidates = stream_candidates(user.top_games, hops, deadline=start + time_budget if time_budget else None)
+    drawn_at = None
+    stopped = None
+    with instrument.stage("stream_recommendations", "Streaming game suggestions"):
+        try:
+            for info in candidates:
+                now = time.perf_counter()
+                if ranker.add(info) and (drawn_at is None or now - drawn_at >= REDRAW_EVERY):
+                    if drawn_at is None:
+                        instrument.add("first_recommendation_s", now - start)
+                    drawn_at = now
+                    click.clear()
+                    show_recommendations(ranker.ranked(), f"⏳ Best so far, from {ranker.seen} games checked...")
+                if time_budget and now - start >= time_budget:
+                    break
+                if stable_after and ranker.unchanged >= stable_after:
+                    stopped = f"✅ Top {ranker.k} unchanged for {stable_after} games, stopped early."
+                    break
+        finally:
+            candidates.close()  # Doesn't wait for requests still running
+    if not stopped and time_budget and time.perf_counter() - start >= time_budget:  # Here or in the stream
+        stopped = f"⏱️ Stopped after {time_budget:g}s, ranked from {ranker.seen} games."
+    user.user_recommendations = ranker.ranked()
+    if drawn_at is not None:
+        click.clear()
+    if stopped:
+        click.secho(stopped, fg="white")
+    return user.user_recommendations
+
+
+def show_recommendations(recommendations, heading="🕹️ Recommended Games for You:"):
+    from tabulate import tabulate
+
+    suggested_games_table = [[game['title'], "\n".join(game['tags'])] for game in recommendations]
+    click.secho(f"\n{heading}", fg="blue", bold=True)
     click.secho(
         tabulate(suggested_games_table, tablefmt="fancy_grid", headers=['Game Title', 'Tags from your Top Tags']))
+
+
+def generate_game_recommendations(user, hops=1, prefetcher=None, offline=False, time_budget=None, stable_after=0):
+    """Find and display game recommendations based on user's top tags.
+    Online and without a prefetched result, provisional results are shown while candidates stream in."""
+    if prefetcher:
+        user.user_recommendations = prefetcher.take("recommendations", recommend_games, user, hops, offline)
+    elif offline:
+        recommend_games(user, hops, offline)
+    else:
+        stream_game_recommendations(user, hops, time_budget, stable_after)
+    if offline and not user.user_recommendations:
+        click.secho("⚠️ No saved games share your top tags yet. Get recommendations online once to build them up.",
+                    fg="yellow")
+        return
+    show_recommendations(user.user_recommendations)
     user.save_recommendations()
 
 
 def display_top_games(user):
     """Display the user's most played games and most frequent tags."""
+    from tabulate import tabulate
+
     game_table = [[game['title'], f"{round(int(game['time']) / 60)}"] for game in user.top_games]
 
-    click.secho("\n🎮 Your Top 15 Games:", fg="green", bold=True)
+    click.secho(f"\n🎮 Your Top {len(user.top_games)} Games:", fg="green", bold=True)
     click.secho(tabulate(game_table, tablefmt="fancy_grid", headers=['Game Title', 'Hours Played']))
 
     tags_table = [[tag, f"{number}"] for tag, number in user.top_tags.items()]
@@ -76,28 +250,36 @@ def display_top_games(user):
 
 
 def get_saved_users():
-    all_users = glob.glob(os.path.join('*_user_info.json'), recursive=True)
-    if len(all_users) == 1:
-        user = all_users[0]
-        with open(user, 'r') as u:
-            data = json.load(u)
-            username = data.get('user')
-            id = data.get('id')
-            if click.confirm(f"Found user info for {username}, proceed with this account?"):
-                return id
+    """Offer to continue as the saved user if there is exactly one."""
+    from profile_store import get_profile_store
+    from steam_user import import_json_profiles
+
+    import_json_profiles()  # Profiles saved as JSON by older versions count too
+    profiles = get_profile_store().list_profiles()
+    if len(profiles) == 1:
+        id, username, _ = profiles[0]
+        if click.confirm(f"Found user info for {username}, proceed with this account?"):
+            return id
     else:
         return False
 
 
-def get_player_news(user):
-    articles = user.get_news()
+@instrument.stage("get_player_news")
+def get_player_news(user, prefetcher=None):
+    articles = prefetcher.take("news", user.get_news) if prefetcher else user.get_news()
     for article in articles:
         click.secho(f"🎮 {article['game']}:",fg="magenta")
         click.secho(f"{article['title']}",fg="cyan")
         click.secho(f"\n🔗Read here: {article['url']}\n\n")
 
-def get_player_statistics(user):
-    user.get_statistics()
+@instrument.stage("get_player_statistics")
+def get_player_statistics(user, prefetcher=None):
+    from tabulate import tabulate
+
+    if prefetcher:
+        prefetcher.take("statistics", user.get_statistics)
+    else:
+        user.get_statistics()
     stats_table = [[game['title'], f"{game['achieved']}%"]for game in user.user_stats]
     click.secho(tabulate(stats_table, tablefmt="fancy_grid", headers=['Game', '% of completed achievements']))
 
@@ -0,0 +1,103 @@
+import json
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlencode
+from urllib.request import urlopen
+
+import click
+
+from cli_helpers import display_menu, display_top_games, get_player_news, get_player_statistics, show_recommendations
+from records import Game, Recommendation
+
+
+class ServiceClient:
+    """Talks to a running Steam Soup service (steam_soup.py --serve)."""
+
+    def __init__(self, url, timeout=600):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def get(self, path, **params):
+        """The JSON answer for one endpoint; raises ValueError with the service's message if it fails."""
+        query = urlencode({key: int(value) if isinstance(value, bool) else value for key, value in params.items()})
+        try:
+            with urlopen(f"{self.url}{path}?{query}" if query else f"{self.url}{path}", timeout=self.timeout) as response:
+                return json.load(response)
+        except HTTPError as e:
+            try:
+                message = json.load(e).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise ValueError(message) from None
+        except URLError as e:
+            raise ValueError(f"Could not reach the Steam Soup service at {self.url} ({e.reason})") from None
+
+
+class RemoteUser:
+    """Stands in for SteamUser in the menu, with the work done by the service."""
+
+    def __init__(self, client, username, top=15, full_library=False, rebuild=False):
+        data = client.get(f"/users/{quote(str(username), safe='')}", top=top, full_library=full_library,
+                          rebuild=rebuild)
+        self.client = client
+        self.username = data["user"]
+        self.user_id = data["steamid"]
+        self.top_tags = data["top_tags"]
+        self.top_games = [Game.from_dict(game) for game in data["top_games"]]
+        self.user_recommendations = []
+        self.user_stats = []
+
+    def path(self, endpoint):
+        return f"/users/{self.user_id}/{endpoint}"
+
+    def recommend(self, hops=1, offline=False):
+        self.user_recommendations = [Recommendation.from_dict(game)
+                                     for game in self.client.get(self.path("recommendations"), hops=hops,
+                                                                 offline=offline)]
+        return self.user_recommendations
+
+    def get_news(self):
+        return self.client.get(self.path("news"))
+
+    def get_statistics(self):
+        self.user_stats = self.client.get(self.path("achievements"))
+
+
+def run_client(url, username, top=15, hops=1, full_library=False, rebuild=False, offline=False, game_recs=False,
+               top_games_tags=False):
+    """The interactive menu, as a thin client of the service."""
+    try:
+        user = RemoteUser(ServiceClient(url), username, top, full_library, rebuild)
+    except ValueError as e:
+        click.secho(f"❌ Error: {e}", fg="red", bold=True)
+        return
+
+    def recommendations():
+        click.secho("🔎 Finding games similar to your favorites...", fg="cyan")
+        if not user.recommend(hops, offline):
+            click.secho("⚠️ No recommendations found.", fg="yellow")
+        else:
+            show_recommendations(user.user_recommendations)
+
+    if top_games_tags:
+        display_top_games(user)
+    if game_recs:
+        recommendations()
+
+    while True:
+        display_menu(user)
+        selection = int(click.prompt("Enter selection"))
+        try:
+            if selection == 5:
+                click.secho("\n👋 Exiting Steam Soup. Have a great day! 🎮", fg="magenta", bold=True)
+                break
+            elif selection == 4:
+                get_player_statistics(user)
+            elif selection == 3:
+                get_player_news(user)
+            elif selection == 2:
+                recommendations()
+            elif selection == 1:
+                display_top_games(user)
+        except ValueError as e:  # The service answered with an error; the menu carries on
+            click.secho(f"⚠️ {e}", fg="yellow")
+        click.pause("\n⏳ Press Enter to continue...\n")
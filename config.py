@@ -1,5 +1,5 @@
 import os
-import webbrowser
+import threading
 
 import click
 from dotenv import load_dotenv
@@ -7,22 +7,78 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 STEAM_KEY = os.getenv("STEAM_KEY")
+_key_lock = threading.Lock()
+ask_for_key = True  # Off in non-interactive runs (--batch), where a missing key is an error instead of a prompt
 # Steam API Key registration page
 steam_api_url = "https://steamcommunity.com/dev/apikey"
+# Base URLs of the Steam store and Web API, overridable to point at a local stand-in
+STORE_URL = os.getenv("STEAM_STORE_URL", "https://store.steampowered.com").rstrip("/")
+API_URL = os.getenv("STEAM_API_URL", "https://api.steampowered.com").rstrip("/")
 
-if not STEAM_KEY:
-    click.secho("\n🚨 STEAM_KEY not found in environment variables! 🚨", fg="red", bold=True)
-    # Attempt to open the Steam API Key page in the default browser
-    click.secho("\nOpening the Steam API Key registration page in your browser...", fg="cyan")
-    webbrowser.open(steam_api_url)
-    # Provide a clickable link for users who prefer to open it manually
-    click.secho(f"\nIf the page did not open, visit this link manually:\n🔗 {steam_api_url}\n", fg="blue", bold=True)
-    # Save the key to the .env file
-    if click.confirm("Would you like to input your Steam API key now?"):
-        steam = click.prompt("Steam Key")
-        with open(".env", "w", encoding="utf-8") as f:
-            f.write(f"STEAM_KEY={steam}")
-        click.secho("✅ STEAM_KEY saved to .env file!", fg="green")
-        STEAM_KEY = steam
-    else:
-        raise ValueError("\n❌ Error: STEAM_KEY is required but was not provided.")
+
+def get_steam_key():
+    """Return the Steam API key, asking for it the first time a request needs one if it isn't set."""
+    global STEAM_KEY
+    with _key_lock:  # Concurrent requests should only ask once
+        if STEAM_KEY:
+            return STEAM_KEY
+        if not ask_for_key:
+            raise ValueError("STEAM_KEY is not set. Add it to the environment or the .env file.")
+        import webbrowser
+
+        click.secho("\n🚨 STEAM_KEY not found in environment variables! 🚨", fg="red", bold=True)
+        # Attempt to open the Steam API Key page in the default browser
+        click.secho("\nOpening the Steam API Key registration page in your browser...", fg="cyan")
+        webbrowser.open(steam_api_url)
+        # Provide a clickable link for users who prefer to open it manually
+        click.secho(f"\nIf the page did not open, visit this link manually:\n🔗 {steam_api_url}\n", fg="blue", bold=True)
+        # Save the key to the .env file
+        if click.confirm("Would you like to input your Steam API key now?"):
+            steam = click.prompt("Steam Key")
+            with open(".env", "w", encoding="utf-8") as f:
+                f.write(f"STEAM_KEY={steam}")
+            click.secho("✅ STEAM_KEY saved to .env file!", fg="green")
+            STEAM_KEY = steam
+            return STEAM_KEY
+        else:
+            raise ValueError("\n❌ Error: STEAM_KEY is required but was not provided.")
+
+
+# Scraper concurrency: worker threads per batch, requests per second to any one host,
+# and requests any one host may get at once before the rate applies
+MAX_WORKERS = int(os.getenv("STEAM_SOUP_WORKERS", 8))
+HOST_RATE_LIMIT = float(os.getenv("STEAM_SOUP_RATE_LIMIT", 20))
+HOST_RATE_BURST = int(os.getenv("STEAM_SOUP_RATE_BURST", 20))
+
+# HTTP client: seconds before a request times out and retries before giving up
+HTTP_TIMEOUT = float(os.getenv("STEAM_SOUP_TIMEOUT", 10))
+HTTP_RETRIES = int(os.getenv("STEAM_SOUP_RETRIES", 3))
+
+# Shared game metadata cache and how long (hours) an entry stays fresh
+CACHE_PATH = os.getenv("STEAM_SOUP_CACHE", "steam_soup_cache.db")
+METADATA_TTL = float(os.getenv("STEAM_SOUP_METADATA_TTL", 24 * 7)) * 3600
+# Hours before a user's achievements or a game's news are fetched again
+ACHIEVEMENTS_TTL = float(os.getenv("STEAM_SOUP_ACHIEVEMENTS_TTL", 24)) * 3600
+NEWS_TTL = float(os.getenv("STEAM_SOUP_NEWS_TTL", 3)) * 3600
+VANITY_TTL = float(os.getenv("STEAM_SOUP_VANITY_TTL", 24 * 30)) * 3600
+# Hours before a game's similar games are scraped again
+SIMILAR_TTL = float(os.getenv("STEAM_SOUP_SIMILAR_TTL", 24 * 30)) * 3600
+# Saved user profiles and recommendations
+PROFILE_PATH = os.getenv("STEAM_SOUP_PROFILES", "steam_soup_profiles.db")
+# Where game metadata may come from; the cheapest one with the fields a lookup needs is used
+METADATA_SOURCE_NAMES = ("appdetails", "store_page")  # The sources in sources.py
+METADATA_SOURCES = [name.strip() for name in os.getenv("STEAM_SOUP_METADATA_SOURCES", "appdetails,store_page").split(",")]
+# Port the local service (steam_soup.py --serve) listens on
+SERVICE_PORT = int(os.getenv("STEAM_SOUP_SERVICE_PORT", 8765))
+# Hours the service keeps a user's profile in memory before bringing it up to date from Steam
+USER_TTL = float(os.getenv("STEAM_SOUP_USER_TTL", 6)) * 3600
+
+
+def check_metadata_sources():
+    """Raise ValueError at startup, instead of on every lookup, if STEAM_SOUP_METADATA_SOURCES can't work."""
+    unknown = [name for name in METADATA_SOURCES if name not in METADATA_SOURCE_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown STEAM_SOUP_METADATA_SOURCES {', '.join(map(repr, unknown))} "
+                         f"(choose from {', '.join(METADATA_SOURCE_NAMES)}).")
+    if "store_page" not in METADATA_SOURCES:
+        raise ValueError("STEAM_SOUP_METADATA_SOURCES must include store_page: user tags only come from store pages.")
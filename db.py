@@ -0,0 +1,37 @@
+import os
+import sqlite3
+import threading
+
+BATCH_SIZE = 500  # Values per IN (...) query, to stay under SQLite's bound parameter limit
+
+
+class Database:
+    """The one connection to a SQLite file, shared by every store keeping tables in it.
+    Hold `lock` for each use: the connection is shared between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+
+    def select_in(self, query, values):
+        """Rows of `query`, whose `{}` is filled with an IN list of `values`, a batch at a time.
+        The caller holds `lock`."""
+        rows = []
+        for start in range(0, len(values), BATCH_SIZE):
+            batch = list(values[start:start + BATCH_SIZE])
+            rows += self.conn.execute(query.format(",".join("?" * len(batch))), batch).fetchall()
+        return rows
+
+
+_databases = {}
+_open_lock = threading.Lock()
+
+
+def connect(path) -> Database:
+    """The shared connection to the database at `path`, opened on first use."""
+    key = os.path.abspath(path)
+    with _open_lock:
+        if key not in _databases:
+            _databases[key] = Database(path)
+        return _databases[key]
@@ -0,0 +1,162 @@
+import time
+from html.parser import HTMLParser
+
+import instrument
+
+CHUNK_SIZE = 64 * 1024  # Pages are fed in chunks so parsing can stop once everything is found
+
+
+def has_class(attrs, name):
+    """True if the tag's class attribute contains `name` as a whole class."""
+    return name in (dict(attrs).get('class') or '').split()
+
+
+class Capture:
+    """Text collected from one open element, counting nested tags of the same name to find its end."""
+
+    __slots__ = ('kind', 'tag', 'depth', 'text')
+
+    def __init__(self, kind, tag):
+        self.kind = kind
+        self.tag = tag
+        self.depth = 1
+        self.text = []
+
+
+class TargetedParser(HTMLParser):
+    """Streams through a page and only keeps the text of the elements `select` picks out.
+    Nothing outside those elements is stored, so no document tree is ever built."""
+
+    def __init__(self):
+        super().__init__()
+        self.open = []
+        self.done = False
+
+    def select(self, tag, attrs):
+        """Return the kind of capture to start for this tag, or None to skip it."""
+        raise NotImplementedError
+
+    def finish(self, capture):
+        """Called with each capture once its element is closed."""
+        raise NotImplementedError
+
+    def inside(self, kind):
+        return any(capture.kind == kind for capture in self.open)
+
+    def handle_starttag(self, tag, attrs):
+        for capture in self.open:
+            if capture.tag == tag:
+                capture.depth += 1
+        kind = self.select(tag, attrs)
+        if kind:
+            self.open.append(Capture(kind, tag))
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags never hold text, so they only matter to select()
+        kind = self.select(tag, attrs)
+        if kind:
+            self.finish(Capture(kind, tag))
+
+    def handle_endtag(self, tag):
+        closed = []
+        for capture in self.open:
+            if capture.tag == tag:
+                capture.depth -= 1
+                if capture.depth == 0:
+                    closed.append(capture)
+        for capture in closed:
+            self.open.remove(capture)
+            self.finish(capture)
+
+    def handle_data(self, data):
+        for capture in self.open:
+            capture.text.append(data)
+
+    def parse(self, content):
+        """Feed a page (bytes or str) until select/finish mark the parser as done."""
+        started = time.perf_counter()
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', errors='replace')
+        for start in range(0, len(content), CHUNK_SIZE):
+            self.feed(content[start:start + CHUNK_SIZE])
+            if self.done:
+                break
+        else:
+            self.close()
+        instrument.add("pages_parsed")
+        instrument.add("parse_s", time.perf_counter() - started)
+        return self
+
+
+class GamePageParser(TargetedParser):
+    """Pulls the title, genres and user tags out of a store app page."""
+
+    def __init__(self):
+        super().__init__()
+        self.title = None
+        self.genres = None
+        self.tags = []
+        self.tags_done = False
+
+    def select(self, tag, attrs):
+        if tag == 'div':
+            element_id = dict(attrs).get('id')
+            if element_id == 'appHubAppName_responsive':
+                return 'title'
+            if element_id == 'genresAndManufacturer':
+                self.genres = []
+                return 'genres'
+            if has_class(attrs, 'popular_tags'):
+                return 'tag_list'
+        elif tag == 'span' and self.inside('genres'):
+            return 'genre'
+        elif tag == 'a' and has_class(attrs, 'app_tag'):
+            return 'tag'
+        return None
+
+    def finish(self, capture):
+        text = ''.join(capture.text)
+        if capture.kind == 'title' and self.title is None:
+            self.title = text
+        elif capture.kind == 'genre':
+            self.genres.append(text.strip())
+        elif capture.kind == 'tag':
+            self.tags.append(text.strip())
+        elif capture.kind == 'tag_list':
+            self.tags_done = True
+        self.done = self.title is not None and self.genres is not None and self.tags_done \
+            and not self.inside('genres')
+
+
+class SimilarGamesParser(TargetedParser):
+    """Pulls the app IDs of the similar game capsules out of a 'more like this' page."""
+
+    def __init__(self, limit=None):
+        super().__init__()
+        self.limit = limit
+        self.app_ids = []
+
+    def select(self, tag, attrs):
+        if tag == 'a' and has_class(attrs, 'similar_grid_capsule'):
+            app_id = dict(attrs).get('data-ds-appid')
+            if app_id and not self.done:
+                self.app_ids.append(int(app_id))
+                self.done = self.limit is not None and len(self.app_ids) >= self.limit
+        return None  # Only the attribute is needed, never the text
+
+    def finish(self, capture):
+        pass
+
+
+def parse_game_page(content):
+    """Return (title, genres, tags) for a store app page.
+    Raises ValueError when the page doesn't have the expected markup (age gate, delisted app...)."""
+    page = GamePageParser().parse(content)
+    if page.title is None or page.genres is None:
+        raise ValueError("store page is missing the game title or genres")
+    return page.title, page.genres, page.tags
+
+
+def parse_similar_games(content, limit=9):
+    """Return the app IDs of the first `limit` similar games listed on a 'more like this' page."""
+    return SimilarGamesParser(limit).parse(content).app_ids
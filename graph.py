@@ -0,0 +1,101 @@
+import time
+
+import numpy as np
+
+import instrument
+from cache import MEMORY_ENTRIES
+from config import CACHE_PATH, SIMILAR_TTL
+from db import connect
+from utils import LRUCache, Shared
+
+
+class SimilarityGraph:
+    """Persistent appid → similar appids graph built from 'more like this' pages.
+    Each app's neighbours are stored in store order as one packed uint32 array."""
+
+    def __init__(self, path=CACHE_PATH, ttl=SIMILAR_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._memory = LRUCache(MEMORY_ENTRIES)  # Recently read apps' (neighbors, fetched_at)
+        self._db = connect(path)  # One connection per file, shared with the other stores in it
+        self._lock, self._conn = self._db.lock, self._db.conn
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS similar (
+                    appid INTEGER PRIMARY KEY,
+                    neighbors BLOB NOT NULL,
+                    fetched_at REAL NOT NULL
+                )""")
+            self._conn.commit()
+
+    def neighbors(self, appid):
+        """Similar app IDs for an app, or None if it hasn't been scraped or its edges are older than the TTL."""
+        row = self._memory.get(int(appid))
+        if row is None:
+            with self._lock:
+                row = self._conn.execute("SELECT neighbors, fetched_at FROM similar WHERE appid = ?",
+                                         (int(appid),)).fetchone()
+            if row:
+                self._memory.put(int(appid), row)
+        if not row or time.time() - row[1] > self.ttl:
+            instrument.add("graph_misses")
+            return None
+        instrument.add("graph_hits")
+        return np.frombuffer(row[0], dtype="<u4").tolist()
+
+    def put(self, appid, neighbors):
+        row = (np.asarray(neighbors, dtype="<u4").tobytes(), time.time())
+        self._memory.put(int(appid), row)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO similar (appid, neighbors, fetched_at) VALUES (?, ?, ?)",
+                               (int(appid), *row))
+            self._conn.commit()
+
+    def adjacency(self, appids):
+        """Stored neighbours of many apps at once, stale ones included: old edges still beat none."""
+        with self._lock:
+            rows = self._db.select_in("SELECT appid, neighbors FROM similar WHERE appid IN ({})",
+                                      [int(appid) for appid in appids])
+        return {appid: np.frombuffer(blob, dtype="<u4") for appid, blob in rows}
+
+    def subgraph(self, seeds, hops):
+        """Nodes and edges reachable from the seeds within `hops` steps of known edges."""
+        nodes = {int(seed): index for index, seed in enumerate(seeds)}
+        sources, targets = [], []
+        frontier = list(nodes)
+        for _ in range(hops):
+            next_frontier = []
+            for appid, neighbors in self.adjacency(frontier).items():
+                for neighbor in neighbors.tolist():
+                    if neighbor not in nodes:
+                        nodes[neighbor] = len(nodes)
+                        next_frontier.append(neighbor)
+                    sources.append(nodes[appid])
+                    targets.append(nodes[neighbor])
+            frontier = next_frontier
+            if not frontier:
+                break
+        return list(nodes), np.array(sources, dtype=np.intp), np.array(targets, dtype=np.intp)
+
+    def personalized_pagerank(self, seed_weights, hops=2, alpha=0.15, iterations=30):
+        """Random walk with restart from the seeds (restarting in proportion to their weight)
+        over the graph within `hops` of them. Returns {appid: score}."""
+        seeds = list(seed_weights)
+        nodes, sources, targets = self.subgraph(seeds, hops)
+        if not len(sources):
+            return {}
+
+        restart = np.zeros(len(nodes))
+        restart[:len(seeds)] = [seed_weights[seed] for seed in seeds]
+        restart /= restart.sum() or 1
+        out_degree = np.bincount(sources, minlength=len(nodes)).astype(float)
+
+        rank = restart.copy()
+        for _ in range(iterations):
+            spread = np.bincount(targets, weights=rank[sources] / out_degree[sources], minlength=len(nodes))
+            dangling = rank[out_degree == 0].sum()  # Walks that reach a leaf jump back to the seeds
+            rank = alpha * restart + (1 - alpha) * (spread + dangling * restart)
+        return dict(zip(nodes, rank.tolist()))
+
+
+get_similarity_graph = Shared(SimilarityGraph)  # The shared similarity graph, opened on first use
@@ -0,0 +1,108 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrument
+from config import HOST_RATE_BURST, HOST_RATE_LIMIT, HTTP_RETRIES, HTTP_TIMEOUT, MAX_WORKERS
+from utils import RateLimiter, Shared
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5  # Seconds before the first retry, doubled on every attempt after
+MAX_WAIT = 60  # Never sleep longer than this, whatever Retry-After says
+
+
+def retry_after(response):
+    """Seconds the server asked us to wait, from a Retry-After header in seconds or HTTP-date form."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return min(max(float(value), 0), MAX_WAIT)
+    except ValueError:
+        pass
+    try:
+        return min(max(parsedate_to_datetime(value).timestamp() - time.time(), 0), MAX_WAIT)
+    except (TypeError, ValueError):
+        return None
+
+
+class SteamClient:
+    """Pooled HTTP session every Steam call goes through.
+    Adds a default timeout, per-host rate limiting, retries with jittered exponential backoff
+    (honoring 429 Retry-After), and keeps request count, bytes and latency totals."""
+
+    def __init__(self, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, rate_limit=HOST_RATE_LIMIT,
+                 pool_size=MAX_WORKERS, burst=HOST_RATE_BURST):
+        self.timeout = timeout
+        self.retries = retries
+        self.limiter = RateLimiter(rate_limit, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(pool_size, 1))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "bytes": 0, "latency": 0.0, "max_latency": 0.0, "retries": 0, "errors": 0}
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(BACKOFF_BASE * 2 ** attempt, MAX_WAIT))
+
+    def record(self, elapsed, size=0, retried=False, failed=False):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["bytes"] += size
+            self._stats["latency"] += elapsed
+            self._stats["max_latency"] = max(self._stats["max_latency"], elapsed)
+            self._stats["retries"] += retried
+            self._stats["errors"] += failed
+        instrument.add("requests")
+        instrument.add("bytes", size)
+        instrument.add("network_s", elapsed)
+        instrument.add("retries", retried)
+
+    def get(self, url, **kwargs):
+        """GET a url, retrying connection errors, timeouts and retryable statuses.
+        Raises requests.RequestException once retries run out, like requests.get would."""
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            self.limiter.wait(url)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.record(time.perf_counter() - start, retried=not last_attempt, failed=True)
+                if last_attempt:
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+
+            retry = response.status_code in RETRY_STATUSES and not last_attempt
+            self.record(time.perf_counter() - start, len(response.content), retried=retry,
+                        failed=response.status_code >= 400)
+            if not retry:
+                return response
+            wait = retry_after(response) if response.status_code == 429 else None
+            time.sleep(wait if wait is not None else self.backoff(attempt))
+
+    def stats(self):
+        """Totals for every request sent so far, retries included."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_latency"] = round(stats["latency"] / stats["requests"], 4) if stats["requests"] else 0.0
+        stats["latency"] = round(stats["latency"], 4)
+        stats["max_latency"] = round(stats["max_latency"], 4)
+        return stats
+
+
+get_client = Shared(SteamClient)  # The shared client, created on first use so every caller reuses its connections
+
+
+def get(url, **kwargs):
+    """GET through the shared client."""
+    return get_client().get(url, **kwargs)
+
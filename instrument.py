@@ -0,0 +1,97 @@
+import contextlib
+import contextvars
+import cProfile
+import functools
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+# Process-wide running totals, bumped by the http client, caches and parsers from any thread
+counters = defaultdict(float)
+_lock = threading.Lock()
+
+stages = deque()  # One record per finished stage, in the order they finished
+# Counters of the stages the current work runs in. Each stage counts only its own work,
+# so stages overlapping on other threads (prefetch, batch workers, service requests) don't mix
+_active = contextvars.ContextVar("active_stages", default=())
+started_at = time.perf_counter()
+profile_stage = None  # Name of the stage to run under cProfile, set by --cprofile
+
+
+def add(name, amount=1):
+    """Bump a counter, and the same counter of each stage the calling work runs in."""
+    with _lock:
+        counters[name] += amount
+        for stage_counters in _active.get():
+            stage_counters[name] += amount
+
+
+def carry(func):
+    """func, counting toward the caller's stages from whichever thread runs it. Wrap work handed to a pool with it."""
+    active = _active.get()
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        token = _active.set(active)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active.reset(token)
+    return run
+
+
+def limit_stages(count):
+    """Keep only the last `count` stage records, so a long-running process doesn't grow without limit."""
+    global stages
+    with _lock:
+        stages = deque(stages, maxlen=count)
+
+
+def snapshot():
+    with _lock:
+        return dict(counters)
+
+
+@contextlib.contextmanager
+def stage(name, label=""):
+    """Record wall time and the counters bumped by a pipeline stage's own work, including work it hands
+    to pools through `carry`. Works as a decorator too. The stage named by profile_stage also runs under cProfile."""
+    profiler = cProfile.Profile() if name == profile_stage else None
+    own = defaultdict(float)
+    token = _active.set(_active.get() + (own,))
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(f"{name}.prof")
+        _active.reset(token)
+        record = {"stage": name, "label": label, "start_s": round(start - started_at, 4),
+                  "wall_s": round(time.perf_counter() - start, 4)}
+        with _lock:
+            record.update({key: round(value, 4) for key, value in own.items()})
+            stages.append(record)
+
+
+def summary():
+    """Every stage plus totals per stage name."""
+    totals = {}
+    with _lock:
+        records = list(stages)
+    for record in records:
+        total = totals.setdefault(record["stage"], {"calls": 0})
+        total["calls"] += 1
+        for key, value in record.items():
+            if isinstance(value, (int, float)) and key != "start_s":
+                total[key] = round(total.get(key, 0) + value, 4)
+    return {"wall_s": round(time.perf_counter() - started_at, 4), "stages": records, "totals": totals,
+            "counters": {key: round(value, 4) for key, value in snapshot().items()}}
+
+
+def write_summary(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary(), f, indent=4)
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+from collections import Counter
+from dataclasses import replace
+
+from records import Game
+from scraper import stream_game_info
+from utils import progress_bar
+
+CHECKPOINT_EVERY = 25  # Games processed between checkpoint writes
+
+
+class LibraryProfile:
+    """Running tag tally and top games for a library streamed in playtime order.
+    Its size depends on the number of tags and top games, not on the size of the library."""
+
+    def __init__(self, top=15, library="", position=0, tag_counts=None, top_games=None):
+        self.top = top
+        self.library = library  # library_hash of the sorted library being processed
+        self.position = position  # Games of the sorted library already processed
+        self.tag_counts = Counter(tag_counts or {})
+        self.top_games = top_games or []
+
+    def add(self, info):
+        self.tag_counts.update(set(info['tags']))
+        # Games arrive most played first, so the first ones that scrape are the top games
+        if len(self.top_games) < self.top:
+            self.top_games.append(replace(info, key=len(self.top_games)))
+
+    def favorite_tags(self):
+        return dict(self.tag_counts.most_common(10))
+
+    def save(self, path):
+        """Write a checkpoint, atomically so an interrupted write never leaves a broken file."""
+        data = {"top": self.top, "library": self.library, "position": self.position, "tag_counts": self.tag_counts,
+                "top_games": [game.as_dict() for game in self.top_games]}
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path, top, library):
+        """Resume from a checkpoint, or start over if there is none or it was for a different top N
+        or a differently ordered library (e.g. playtime changed since), since resuming is by position."""
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (IOError, json.JSONDecodeError):
+            return cls(top, library)
+        if data.get("top") != top or data.get("library") != library:
+            return cls(top, library)
+        return cls(top, library, data["position"], data["tag_counts"],
+                   [Game.from_dict(game) for game in data["top_games"]])
+
+
+def library_hash(games) -> str:
+    """Fingerprint of a library's appids in processing order."""
+    return hashlib.sha1(",".join(str(game['id']) for game in games).encode()).hexdigest()
+
+
+@progress_bar()
+def stream_library(games: list[dict[str, int]], top=15, checkpoint_path=None, bar=None, label="") -> LibraryProfile:
+    """Streams a whole library through fetch → parse → tag tally, checkpointing as it goes.
+    `games` must be sorted by playtime; an interrupted run picks up where its checkpoint left off."""
+    library = library_hash(games)
+    profile = LibraryProfile.load(checkpoint_path, top, library) if checkpoint_path else LibraryProfile(top, library)
+    if bar and profile.position:
+        bar.update(profile.position)
+
+    remaining = (games[index] for index in range(profile.position, len(games)))
+    for _, info in stream_game_info(remaining):
+        if info:
+            profile.add(info)
+        profile.position += 1
+        if bar:
+            bar.update(1)
+        if checkpoint_path and profile.position % CHECKPOINT_EVERY == 0:
+            profile.save(checkpoint_path)
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)  # Finished, nothing left to resume
+    return profile
@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+import utils
+
+
+class Prefetcher:
+    """Runs menu actions in the background while the menu waits for input.
+    A handler takes its action's result with `take`, waiting for it if it is still running,
+    or runs the action itself if it was never started or failed in the background."""
+
+    def __init__(self, max_workers=3):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def start(self, name, func, *args):
+        with self._lock:
+            self._futures[name] = self._pool.submit(instrument.carry(self._run), name, func, *args)
+
+    @staticmethod
+    def _run(name, func, *args):
+        with utils.quiet(), instrument.stage(f"prefetch_{name}"):
+            return func(*args)
+
+    def take(self, name, func, *args):
+        """The prefetched result of `name`, used once; later calls run func in the foreground."""
+        with self._lock:
+            future = self._futures.pop(name, None)
+        if future is not None and not future.cancelled():
+            try:
+                result = future.result()
+                instrument.add("prefetch_used")
+                return result
+            except Exception:  # Whatever it hit, running it again in the foreground reports it properly
+                instrument.add("prefetch_failed")
+        return func(*args)
+
+    def cancel(self):
+        """Drop work that hasn't started and stop what's running at its next request."""
+        utils.stopping.set()
+        with self._lock:
+            self._futures.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
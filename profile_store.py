@@ -0,0 +1,240 @@
+import contextlib
+import sqlite3
+import sys
+import time
+from array import array
+
+from config import PROFILE_PATH
+from db import connect
+from records import Game, Recommendation
+from utils import Shared
+
+SCHEMA_VERSION = 1
+
+# Each entry upgrades the database from the version before it
+MIGRATIONS = {
+    1: """
+        CREATE TABLE labels (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL
+        );
+        CREATE TABLE apps (
+            appid INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            url TEXT NOT NULL,
+            tag_ids BLOB NOT NULL,
+            genre_ids BLOB NOT NULL,
+            fetched_at REAL NOT NULL
+        );
+        CREATE TABLE profiles (
+            steamid TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            saved_at REAL NOT NULL,
+            appids BLOB NOT NULL,
+            playtimes BLOB NOT NULL,
+            top_tag_ids BLOB NOT NULL,
+            top_tag_counts BLOB NOT NULL
+        );
+        CREATE TABLE recommendations (
+            steamid TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            appid INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            tag_ids BLOB NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (steamid, rank)
+        );
+    """,
+}
+
+
+def pack(numbers, typecode="I"):
+    """Little-endian packed array of unsigned ints ('I') or doubles ('d')."""
+    packed = array(typecode, numbers)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack(blob, typecode="I"):
+    if sys.byteorder == "little":
+        return memoryview(blob).cast(typecode)  # No copy: read the numbers straight out of the blob
+    unpacked = array(typecode)
+    unpacked.frombytes(blob)
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
+class ProfileStore:
+    """Saved user profiles and recommendations in SQLite, with versioned schema.
+    Tag and genre strings are stored once in `labels` and referenced by ID everywhere else,
+    and each profile is a single row of packed arrays, so scanning thousands of them is cheap."""
+
+    def __init__(self, path=PROFILE_PATH):
+        self.path = path
+        self._db = connect(path)  # One connection per file, shared with the other stores in it
+        self._lock, self._conn = self._db.lock, self._db.conn
+        self._label_ids = None
+        self._label_names = None
+        self._apps = {}  # appid → (title, url, tags, genres, fetched_at), decoded once and shared by every profile
+        self.migrate()
+
+    def migrate(self):
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise ValueError(f"{self.path} was written by a newer Steam Soup (schema {version}).")
+            for next_version in range(version + 1, SCHEMA_VERSION + 1):
+                self._conn.executescript(MIGRATIONS[next_version])
+                self._conn.execute(f"PRAGMA user_version = {next_version}")
+            self._conn.commit()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Hold the lock for a write, committing at the end or rolling all of it back if any of it fails."""
+        with self._lock:
+            try:
+                yield
+                self._conn.commit()
+            except sqlite3.Error:
+                self._conn.rollback()
+                self._label_ids = None  # Forget labels and apps the rolled back writes added
+                self._apps.clear()
+                raise
+
+    def _load_labels(self, reload=False):
+        """Read the label map, or read it again (reload) for labels other processes have added since."""
+        if self._label_ids is None or reload:
+            rows = self._conn.execute("SELECT id, name FROM labels").fetchall()
+            self._label_ids = {sys.intern(name): label_id for label_id, name in rows}
+            self._label_names = {label_id: name for name, label_id in self._label_ids.items()}
+
+    def _label_ids_for(self, names):
+        """IDs for tag/genre names, adding any the store hasn't seen yet."""
+        self._load_labels()
+        ids = []
+        for name in names:
+            if name not in self._label_ids:
+                name = sys.intern(name)
+                # Another process may have added it since our labels were read
+                self._conn.execute("INSERT OR IGNORE INTO labels (name) VALUES (?)", (name,))
+                label_id = self._conn.execute("SELECT id FROM labels WHERE name = ?", (name,)).fetchone()[0]
+                self._label_ids[name] = label_id
+                self._label_names[label_id] = name
+            ids.append(self._label_ids[name])
+        return ids
+
+    def _names_for(self, blob):
+        return self._decode([blob])[0]
+
+    def _save_apps(self, games):
+        for game in games:
+            self._apps[game.id] = (game.title, game.url, game.tags, game.genres, game.fetched_at)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO apps (appid, title, url, tag_ids, genre_ids, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(game.id, game.title, game.url, pack(self._label_ids_for(game.tags)),
+              pack(self._label_ids_for(game.genres)), game.fetched_at) for game in games])
+
+    def save_profile(self, steamid, username, top_tags, top_games):
+        with self._transaction():
+            self._save_apps(top_games)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profiles (steamid, username, saved_at, appids, playtimes, top_tag_ids, "
+                "top_tag_counts) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(steamid), username, time.time(), pack([game.id for game in top_games]),
+                 pack([game.time for game in top_games]), pack(self._label_ids_for(top_tags)),
+                 pack(list(top_tags.values()))))
+
+    def _decode(self, blobs):
+        """Label tuples for many packed ID blobs, decoded in one pass rather than one at a time."""
+        ids = unpack(b"".join(blobs))
+        try:
+            names = list(map(self._label_names.__getitem__, ids))
+        except KeyError:  # Saved by another process with labels added after ours were read
+            self._load_labels(reload=True)
+            names = list(map(self._label_names.__getitem__, ids))
+        decoded, start = [], 0
+        for blob in blobs:
+            end = start + len(blob) // 4
+            decoded.append(tuple(names[start:end]))
+            start = end
+        return decoded
+
+    def _load_apps(self, appids=None):
+        """Decode the apps (all of them, or those asked for) not decoded yet."""
+        query = "SELECT appid, title, url, tag_ids, genre_ids, fetched_at FROM apps"
+        if appids is None:
+            rows = self._conn.execute(query).fetchall()
+        else:
+            rows = self._db.select_in(f"{query} WHERE appid IN ({{}})",
+                                      [appid for appid in appids if appid not in self._apps])
+        tags = self._decode([row[3] for row in rows])
+        genres = self._decode([row[4] for row in rows])
+        for (appid, title, url, _, _, fetched_at), app_tags, app_genres in zip(rows, tags, genres):
+            self._apps[appid] = (title, url, app_tags, app_genres, fetched_at)
+
+    def load_profiles(self, steamids=None):
+        """Saved profiles (every one, or those asked for) as {user, id, saved_at, top_tags, top_games}.
+        Apps shared between profiles are read and decoded once."""
+        query = "SELECT steamid, username, saved_at, appids, playtimes, top_tag_ids, top_tag_counts FROM profiles"
+        with self._lock:
+            if steamids is None:
+                rows = self._conn.execute(query).fetchall()
+            else:
+                rows = self._db.select_in(f"{query} WHERE steamid IN ({{}})", [str(steamid) for steamid in steamids])
+            self._load_labels()
+            if steamids is None and not self._apps:
+                self._load_apps()  # A full scan needs nearly every app: one table scan beats lookups
+            else:
+                self._load_apps(list(dict.fromkeys(appid for row in rows for appid in unpack(row[3]))))
+            top_tag_names = self._decode([row[5] for row in rows])
+            profiles = []
+            for (steamid, username, saved_at, appids, playtimes, _, top_tag_counts), tag_names in zip(rows,
+                                                                                                      top_tag_names):
+                top_games = []
+                for key, (appid, playtime) in enumerate(zip(unpack(appids), unpack(playtimes))):
+                    title, url, tags, genres, fetched_at = self._apps[appid]
+                    top_games.append(Game(appid, title, url, playtime, tags, genres, fetched_at, key))
+                profiles.append({"user": username, "id": steamid, "saved_at": saved_at,
+                                 "top_tags": dict(zip(tag_names, unpack(top_tag_counts))), "top_games": top_games})
+        return profiles
+
+    def load_profile(self, steamid):
+        """The saved profile as {user, id, saved_at, top_tags, top_games}, or None if there isn't one."""
+        profiles = self.load_profiles([steamid])
+        return profiles[0] if profiles else None
+
+    def has_profile(self, steamid):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM profiles WHERE steamid = ?", (str(steamid),)).fetchone() is not None
+
+    def list_profiles(self):
+        """(steamid, username, saved_at) of every saved profile, without loading any games."""
+        with self._lock:
+            return self._conn.execute("SELECT steamid, username, saved_at FROM profiles ORDER BY saved_at DESC").fetchall()
+
+    def save_recommendations(self, steamid, recommendations):
+        with self._transaction():
+            self._conn.execute("DELETE FROM recommendations WHERE steamid = ?", (str(steamid),))
+            self._conn.executemany(
+                "INSERT INTO recommendations (steamid, rank, appid, title, tag_ids, score) VALUES (?, ?, ?, ?, ?, ?)",
+                [(str(steamid), rank, game.id, game.title, pack(self._label_ids_for(game.tags)), game.score)
+                 for rank, game in enumerate(recommendations)])
+
+    def load_recommendations(self, steamid):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT appid, title, tag_ids, score FROM recommendations WHERE steamid = ? ORDER BY rank",
+                (str(steamid),)).fetchall()
+            self._load_labels()
+            return [Recommendation(appid, title, self._names_for(tag_ids), score)
+                    for appid, title, tag_ids, score in rows]
+
+    def delete(self, steamid):
+        with self._transaction():
+            self._conn.execute("DELETE FROM profiles WHERE steamid = ?", (str(steamid),))
+            self._conn.execute("DELETE FROM recommendations WHERE steamid = ?", (str(steamid),))
+
+
+get_profile_store = Shared(ProfileStore)  # The shared profile store, opened on first use
@@ -1,36 +1,193 @@
+import heapq
+import math
 from collections import defaultdict
+from itertools import chain
 
+import numpy as np
+
+from records import Game, Recommendation
 from utils import progress_bar
 
 
-def favorite_tags(games_list: list[dict[str, any]]) -> dict[str, int]:
+class TagMatrix:
+    """0/1 game × tag matrix in CSR form: row r's tag columns are indices[indptr[r]:indptr[r + 1]].
+    `rows` holds each entry's row, so row and column sums are single bincounts."""
+
+    __slots__ = ("index", "indptr", "indices", "rows")
+
+    def __init__(self, index, indptr, indices, rows):
+        self.index = index  # Columns are the index's tags, including any indexed after this was built
+        self.indptr = indptr
+        self.indices = indices
+        self.rows = rows
+
+    @property
+    def shape(self):
+        return len(self.indptr) - 1, len(self.index.tags)
+
+    def column_sums(self, row_weights=None) -> np.ndarray:
+        """row_weights @ matrix (or the plain column sums)."""
+        weights = None if row_weights is None else row_weights[self.rows]
+        return np.bincount(self.indices, weights=weights, minlength=self.shape[1])
+
+    def row_sums(self, column_values) -> np.ndarray:
+        """matrix @ column_values."""
+        return np.bincount(self.rows, weights=column_values[self.indices], minlength=self.shape[0])
+
+
+class TagIndex:
+    """Gives every tag seen a column, so a list of games becomes a sparse game × tag matrix."""
+
+    def __init__(self, games_list=()):
+        self.columns = defaultdict()
+        self.columns.default_factory = self.columns.__len__  # A new tag gets the next column
+        self.matrix(games_list)
+
+    @property
+    def tags(self):
+        return list(self.columns)
+
+    def matrix(self, games_list) -> TagMatrix:
+        """Matrix with a row per game, indexing any tags not seen before."""
+        lengths = np.fromiter((len(game['tags']) for game in games_list), dtype=np.int64, count=len(games_list))
+        flat = chain.from_iterable(game['tags'] for game in games_list)
+        columns = np.fromiter(map(self.columns.__getitem__, flat), dtype=np.int64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(games_list), dtype=np.int64), lengths)
+        # Sorted by row then column, with any tag listed twice for a game kept once
+        keys = np.sort(rows * len(self.columns) + columns)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+        rows, columns = np.divmod(keys, max(len(self.columns), 1))
+        indptr = np.zeros(len(games_list) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(games_list)), out=indptr[1:])
+        return TagMatrix(self, indptr, columns.astype(np.int32), rows.astype(np.int32))
+
+
+def playtime_weights(games_list) -> np.ndarray:
+    """log-scaled playtime per game, so one 2000 hour game doesn't drown out the rest."""
+    weights = np.log1p(np.array([float(game.get('time', 0)) for game in games_list], dtype=np.float32))
+    return weights if weights.any() else np.ones(len(games_list), dtype=np.float32)
+
+
+def favorite_tags(games_list: list[Game]) -> dict[str, int]:
     """Creates a tally for users tags, and sorts them by most often seen in favorite games"""
-    tag_counts = defaultdict(int)
+    index = TagIndex()
+    tag_counts = index.matrix(games_list).column_sums()
 
-    for game in games_list:
-        for tag in game['tags']:
-            tag_counts[tag] += 1
+    top = np.argsort(-tag_counts, kind="stable")[0:10]  # Only returns top 10 tags
+    tags = index.tags
+    return {tags[column]: int(tag_counts[column]) for column in top}
 
-    sorted_tally = sorted(tag_counts.items(), key=lambda item: item[1], reverse=True)
-    return dict(sorted_tally[0:10])  # Only returns top 10 tags
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k best scores, best first, without sorting the whole array."""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.array([], dtype=np.intp)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.lexsort((best, -scores[best]))]  # Ties keep their original order
 
 
 @progress_bar()
-def top_new_games(owned_games: list[dict[str, list[str]]],
-                  games: list[dict[str, list[str]]],
-                  tags: dict[str, int], bar=None, label="") \
-        -> list[dict[str, list]]:
-    """Sorts games by how many of the users favorite tags it has."""
-    owned_game_ids = [game['id'] for game in owned_games]
+def top_new_games(owned_games: list[Game],
+                  games: list[Game],
+                  tags: dict[str, int], bar=None, label="", k=15, document_frequency=None, corpus_size=0) \
+        -> list[Recommendation]:
+    """Ranks games by playtime-weighted, IDF-adjusted cosine similarity to the user's tag profile.
+    IDF comes from `document_frequency` over `corpus_size` apps (the tag index, scored exactly as
+    StreamingRanker does), or from the owned and candidate games themselves if none is given."""
+    stage = len(owned_games) // 3  # The bar is as long as owned_games, split over three steps
+    owned_game_ids = np.array([int(game['id']) for game in owned_games], dtype=np.int64)
+    candidates = games
+    candidate_ids = np.array([int(game['id']) for game in candidates], dtype=np.int64)
     if bar:
-        bar.update(5)
-    ranked_games = [
-        {"title": game['title'], "id": game['id'], "tags": list(set(game['tags']) & set(tags))}
-        for game in games]
+        bar.update(stage)
+
+    index = TagIndex()
+    owned_matrix = index.matrix(owned_games)
+    candidate_matrix = index.matrix(candidates)
+
+    # Rare tags say more about a game than ones nearly everything has
+    if document_frequency is None:
+        document_frequency = owned_matrix.column_sums() + candidate_matrix.column_sums()
+        corpus_size = len(owned_games) + len(candidates)
+    else:
+        document_frequency = np.array([document_frequency.get(tag, 0) for tag in index.tags], dtype=np.float64)
+    idf = np.log((1 + corpus_size) / (1 + document_frequency)) + 1
+
+    # Cosine similarity of each candidate's IDF-weighted tags to the profile, straight from the sparse rows
+    profile = owned_matrix.column_sums(playtime_weights(owned_games)) * idf
+    norms = np.sqrt(candidate_matrix.row_sums(idf * idf)) * np.linalg.norm(profile)
+    scores = np.divide(candidate_matrix.row_sums(idf * profile), norms, out=np.zeros(len(candidates)),
+                       where=norms > 0)
+    scores[np.isin(candidate_ids, owned_game_ids)] = -np.inf  # Exclude owned games
     if bar:
-        bar.update(5)
-    sorted_games = sorted(ranked_games, key=lambda x: len(x['tags']), reverse=True)
+        bar.update(stage)
+
+    best = [position for position in top_k(scores, k) if np.isfinite(scores[position])]
+    ranked_games = [
+        Recommendation(candidates[position]['id'], candidates[position]['title'],
+                       [tag for tag in candidates[position]['tags'] if tag in tags],
+                       round(float(scores[position]), 4))
+        for position in best]
     if bar:
-        bar.update(5)
+        bar.update(len(owned_games) - 2 * stage)
+
+    return ranked_games
+
+
+class StreamingRanker:
+    """Keeps the best k of a stream of candidates as they arrive.
+    Each candidate is scored on its own against a fixed profile, with IDF from a fixed document
+    frequency table (the tag index), so nothing already seen ever needs scoring again."""
+
+    def __init__(self, owned_games: list[Game], tags: dict[str, int], k=15, document_frequency=None,
+                 corpus_size=0):
+        self.k = k
+        self.tags = tags
+        self.owned = {int(game['id']) for game in owned_games}
+        self.document_frequency = document_frequency or {}
+        self.corpus_size = corpus_size
+        profile = defaultdict(float)
+        for weight, game in zip(playtime_weights(owned_games).tolist(), owned_games):
+            for tag in set(game['tags']):
+                profile[tag] += weight
+        self.profile = {tag: value * self.idf(tag) for tag, value in profile.items()}
+        self.profile_norm = math.sqrt(sum(value * value for value in self.profile.values()))
+        self.seen = 0
+        self.unchanged = 0  # Candidates in a row that didn't get into the top k
+        self._heap = []  # (score, -arrival, game) with the worst of the top k first
+        self._seen_ids = set()
+
+    def idf(self, tag):
+        return math.log((1 + self.corpus_size) / (1 + self.document_frequency.get(tag, 0))) + 1
+
+    def score(self, game):
+        """Cosine similarity of the game's IDF-weighted tags to the profile."""
+        weights = {tag: self.idf(tag) for tag in set(game['tags'])}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) * self.profile_norm
+        if not norm:
+            return 0.0
+        return sum(self.profile.get(tag, 0.0) * weight for tag, weight in weights.items()) / norm
+
+    def add(self, game: Game) -> bool:
+        """Score one candidate; True if it made it into the top k."""
+        appid = int(game['id'])
+        if appid in self.owned or appid in self._seen_ids:
+            return False
+        self._seen_ids.add(appid)
+        self.seen += 1
+        entry = (self.score(game), -self.seen, game)  # Ties go to the earlier candidate
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+        else:
+            self.unchanged += 1
+            return False
+        self.unchanged = 0
+        return True
 
-    return [game for game in sorted_games if game['id'] not in owned_game_ids][:15]  # Exclude owned games
+    def ranked(self) -> list[Recommendation]:
+        return [Recommendation(game['id'], game['title'], [tag for tag in game['tags'] if tag in self.tags],
+                               round(score, 4))
+                for score, _, game in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
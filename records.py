@@ -0,0 +1,66 @@
+import sys
+from dataclasses import asdict, dataclass, fields
+
+
+class Record:
+    """Read access by key (record['title'], record.get('time', 0)), so code written against
+    the plain dicts games used to be keeps working with the slotted records."""
+
+    __slots__ = ()
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def keys(self):
+        return [field.name for field in fields(self)]
+
+    def as_dict(self):
+        """Plain dict for JSON export."""
+        data = asdict(self)
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in data.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        names = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+
+def intern_all(strings):
+    """Tags and genres repeat across thousands of games; intern them so each is stored once.
+    Tuples are taken as already interned: every tuple of labels a record holds came from here."""
+    return strings if type(strings) is tuple else tuple(map(sys.intern, strings))
+
+
+@dataclass(slots=True)
+class Game(Record):
+    id: int
+    title: str = ""
+    url: str = ""
+    time: int = 0  # Minutes played, for games from a user's library
+    tags: tuple = ()
+    genres: tuple = ()
+    fetched_at: float = 0.0
+    key: int = 0  # Position in the list it was fetched for
+
+    def __post_init__(self):
+        self.id = int(self.id)
+        self.tags = intern_all(self.tags)
+        self.genres = intern_all(self.genres)
+
+
+@dataclass(slots=True)
+class Recommendation(Record):
+    id: int
+    title: str
+    tags: tuple = ()  # The recommended game's tags that are among the user's top tags
+    score: float = 0.0
+
+    def __post_init__(self):
+        self.id = int(self.id)
+        self.tags = intern_all(self.tags)
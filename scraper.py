@@ -1,56 +1,198 @@
+import math
+from dataclasses import replace
+from functools import partial
+
+import click
 import requests
-from bs4 import BeautifulSoup
 
-from utils import progress_bar
+from cache import get_metadata_cache
+import http_client
+from config import MAX_WORKERS, STORE_URL
+from extract import parse_similar_games
+from graph import get_similarity_graph
+from records import Game
+from sources import FULL, TITLE, cheapest_source, fetch, lookup, remember
+import utils
+from utils import map_concurrently, progress_bar, stream_concurrently
 
 
-@progress_bar()
-def get_game_info(games:list[dict[str,int]], bar=None, label="")-> list[dict[str,list[str]]]:
-    """Scrapes Steam Store to retrieve name, tags, and genres for a given list of games."""
-    scraped_games = []
+_in_flight = utils.SingleFlight()
+FRONTIER_PAGES = 45  # Most 'more like this' pages scraped for each hop past the first
 
-    for key, game in enumerate(games):
-        game_url = f"https://store.steampowered.com/app/{game['id']}/"
-        try:
-            response = requests.get(game_url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, "html.parser")
 
-            game_genres = soup.find('div', attrs={'id': 'genresAndManufacturer'})
-            game_name = soup.find('div', attrs={'id': 'appHubAppName_responsive'}).text
+def report_failure(game, error):
+    """Tell the user a game was skipped instead of aborting the whole batch."""
+    if utils.is_quiet():
+        return
+    click.secho(f"\n⚠️ Skipping game ID {game['id']}: {error}", fg="yellow", err=True)
 
-            genres = [genre.text.strip() for genre in game_genres.find_all('span')]
-            tags = [tag.text.strip() for tag in soup.find_all('a', attrs={'class': 'app_tag'})]
 
-            scraped_games.append(
-                {'key': key, 'id': game['id'], 'title': game_name, 'url': game_url, "time": game.get("time", 0),
-                 'tags': tags, 'genres': genres})
-            if bar:
-                bar.update(1)
+@progress_bar()
+def get_game_info(games: list[Game], bar=None, label="", max_workers=MAX_WORKERS, fields=FULL) -> list[Game]:
+    """Retrieves at least `fields` (name, tags, genres by default) for a given list of games.
+    Games already in the metadata cache are read locally; only missing or stale ones are fetched,
+    from the cheapest source that has those fields."""
+    cache = get_metadata_cache()
+    results = [cache.get(game['id'], tags="tags" in fields) for game in games]
+    missing = [key for key, cached in enumerate(results) if cached is None]
+    if bar:
+        bar.update(len(games) - len(missing))
 
-        except requests.RequestException as e:
-            raise ValueError(f"Failed to fetch data for game ID {game['id']}: {e}")  # 🔥 Stops execution
+    if missing:
+        # ValueError means the source had no usable data (age gate, delisted app...)
+        source = cheapest_source(fields)
+        fetched = map_concurrently(partial(fetch, source), [games[key] for key in missing], max_workers, bar=bar,
+                                   errors=(requests.RequestException, ValueError), on_error=report_failure)
+        for key, game in zip(missing, fetched):
+            if game:
+                results[key] = game
+        remember([game for game in fetched if game], source)
 
-        if not scraped_games:
-            raise ValueError("No valid game data found.")  # 🔥 Prevents returning an empty list
+    scraped_games = [replace(game, key=key, time=games[key].get("time", 0)) for key, game in enumerate(results) if game]
+    if games and not scraped_games:
+        raise ValueError("No valid game data found.")  # 🔥 Prevents returning an empty list
 
     return scraped_games
 
 
+def cached_game_info(game: Game, fields=FULL) -> Game:
+    """Metadata for one game from the cache, fetching and caching it if missing or stale."""
+    return replace(lookup(game, fields), time=game.get("time", 0))
+
+
+def game_titles(games: list[Game], max_workers=MAX_WORKERS) -> dict[int, str]:
+    """Titles by app ID. Games without one are looked up by title only, which never needs a store page."""
+    titles = {game['id']: game.get('title') for game in games}
+    untitled = [game for game in games if not titles[game['id']]]
+    looked_up = map_concurrently(partial(lookup, fields=TITLE), untitled, max_workers,
+                                 errors=(requests.RequestException, ValueError), on_error=report_failure)
+    for game, info in zip(untitled, looked_up):
+        titles[game['id']] = info['title'] if info else f"App {game['id']}"
+    return titles
+
+
+def stream_game_info(games, max_workers=MAX_WORKERS, deadline=None):
+    """Yields (game, info) for a stream of games in input order, with info None for games that failed.
+    Only a bounded number of pages is held at once, however long the stream is."""
+    return stream_concurrently(cached_game_info, games, max_workers,
+                               errors=(requests.RequestException, ValueError), on_error=report_failure,
+                               deadline=deadline)
+
+
+def scrape_similar(game: Game) -> list[int]:
+    """Scrapes the 'more like this' page of a game for the app IDs of similar games,
+    once per app however many callers ask for it at the same time."""
+    def scrape_once():
+        game_url = f"{STORE_URL}/recommended/morelike/app/{game['id']}/"
+        response = http_client.get(game_url)
+        response.raise_for_status()
+        return parse_similar_games(response.content, limit=None)  # Keep every edge for the graph
+
+    return _in_flight.do(("similar", int(game['id'])), scrape_once)
+
+
 @progress_bar()
-def new_games(games:list[dict[str,list[str]]], bar=None, label="")->list[dict[str,int]]:
-    """Finds the games marked as similar to any list of games."""
+def new_games(games: list[Game], bar=None, label="", max_workers=MAX_WORKERS, hops=1,
+              pool_size=None) -> list[Game]:
+    """Finds the games marked as similar to any list of games.
+    Similar games come from the stored similarity graph; only games it doesn't know yet are scraped.
+    With hops > 1, games further out are scraped too (see expand_frontier), then candidates are ranked
+    by personalized PageRank from the games, weighted by playtime."""
+    graph = get_similarity_graph()
+    known = {game['id']: graph.neighbors(game['id']) for game in games}
+    missing = [game for game in games if known[game['id']] is None]
+    if bar:
+        bar.update(len(games) - len(missing))
+
+    results = map_concurrently(scrape_similar, missing, max_workers, bar=bar,
+                               errors=(requests.RequestException, ValueError), on_error=report_failure)
+    for game, similar_games in zip(missing, results):
+        if similar_games is not None:
+            graph.put(game['id'], similar_games)
+            known[game['id']] = similar_games
+
+    pool_size = pool_size or len(games) * 9
+    if hops > 1:
+        expand_frontier(games, known, hops, max_workers)
+        seed_weights = {game['id']: math.log1p(game.get('time', 0)) or 1.0 for game in games}
+        ranks = graph.personalized_pagerank(seed_weights, hops=hops)
+        ranked = sorted((appid for appid in ranks if appid not in seed_weights), key=ranks.get, reverse=True)
+        return [Game(game) for game in ranked[:pool_size]]
+
     new_game_ids = []
     for game in games:
-        game_url = f"https://store.steampowered.com/recommended/morelike/app/{game['id']}/"
-        soup = BeautifulSoup(requests.get(game_url).content, "html.parser")
-        similar_games = [int(game['data-ds-appid']) for game in
-                         soup.find_all('a', attrs={'class': 'similar_grid_capsule'})[0:9]]
-        bar.update(1)
-        similar_games_sorted = [game for game in similar_games if game not in new_game_ids]
+        similar_games = known[game['id']]
+        if not similar_games:
+            continue
+        similar_games_sorted = [game for game in similar_games[0:9] if game not in new_game_ids]
 
         new_game_ids.extend(similar_games_sorted)
 
-    return_games = [{"id": game} for game in new_game_ids]
+    return_games = [Game(game) for game in new_game_ids]
 
     return return_games
+
+
+def expand_frontier(games: list[Game], known: dict, hops: int, max_workers=MAX_WORKERS):
+    """Scrape the similar games of games up to `hops - 1` steps out from `games` that the graph doesn't
+    know yet, following each game's 9 closest matches and at most FRONTIER_PAGES pages a step,
+    so a walk over a fresh graph has edges to follow. `known` maps appid → similar appids and is updated."""
+    graph = get_similarity_graph()
+    layer = [game['id'] for game in games]
+    reached = set(layer)
+    for _ in range(hops - 1):
+        frontier = []
+        for appid in layer:
+            for neighbor in (known.get(appid) or [])[0:9]:
+                if neighbor not in reached:
+                    reached.add(neighbor)
+                    frontier.append(neighbor)
+        for appid in frontier:
+            known[appid] = graph.neighbors(appid)
+        missing = [Game(appid) for appid in frontier if known[appid] is None][:FRONTIER_PAGES]
+        results = map_concurrently(scrape_similar, missing, max_workers,
+                                   errors=(requests.RequestException, ValueError), on_error=report_failure)
+        for game, similar_games in zip(missing, results):
+            if similar_games is not None:
+                graph.put(game['id'], similar_games)
+                known[game['id']] = similar_games
+        layer = frontier
+
+
+def known_similar(game: Game) -> list[int]:
+    """Similar app IDs from the stored graph, scraping and storing them if it doesn't know the game yet."""
+    graph = get_similarity_graph()
+    similar_games = graph.neighbors(game['id'])
+    if similar_games is None:
+        similar_games = scrape_similar(game)
+        graph.put(game['id'], similar_games)
+    return similar_games
+
+
+def stream_similar(games: list[Game], max_workers=MAX_WORKERS, deadline=None):
+    """Yields the same candidates as new_games with hops=1, in the same order, as each game's similar games arrive."""
+    seen = set()
+    for _, similar_games in stream_concurrently(known_similar, games, max_workers,
+                                                errors=(requests.RequestException, ValueError),
+                                                on_error=report_failure, deadline=deadline):
+        for appid in (similar_games or [])[0:9]:
+            if appid not in seen:
+                seen.add(appid)
+                yield Game(appid)
+
+
+def stream_candidates(games: list[Game], hops=1, max_workers=MAX_WORKERS, deadline=None):
+    """Yields metadata for each candidate game as soon as it is ready, starting from the most played games,
+    until the deadline (a time.perf_counter() value) if there is one.
+    With hops > 1 the whole graph walk has to finish first, then candidates stream in rank order."""
+    if hops > 1:
+        candidates = new_games(games, label="🔎 Finding games similar to your favorites...", hops=hops)
+    else:
+        candidates = stream_similar(games, max_workers, deadline)
+    infos = stream_game_info(candidates, max_workers, deadline)
+    try:
+        for _, info in infos:
+            if info:
+                yield info
+    finally:
+        infos.close()  # Stopping early doesn't wait for pages still being requested
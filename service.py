@@ -0,0 +1,183 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import click
+
+import instrument
+import utils
+from cache import get_metadata_cache
+from cli_helpers import collect_user_data, recommend_games, refresh_user_data
+from config import SERVICE_PORT, USER_TTL
+from steam_user import SteamUser, resolve_vanity
+
+STAGE_HISTORY = 1000  # Stage records kept for /stats; a long-running service would otherwise grow without limit
+
+
+class SteamSoupService:
+    """The app's operations for any number of users, in one long-running process.
+    Loaded users, the caches, the similarity graph and the HTTP connection pool stay warm
+    between requests, and concurrent identical requests are answered by a single run."""
+
+    def __init__(self):
+        self.users = {}  # steamid → (SteamUser, (top, full_library), loaded_at)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._in_flight = utils.SingleFlight()
+
+    def user(self, name, top=None, full_library=None, rebuild=False):
+        """The user's profile, kept in memory for USER_TTL. It is brought up to date from Steam when
+        first loaded, once it's older than that, or when asked for with a different top N or library mode.
+        Without `top` and `full_library`, whatever profile is in memory will do."""
+        steam_id = name if name.isnumeric() else resolve_vanity(name)
+        if not steam_id:
+            raise LookupError("Could not resolve Steam ID")
+        with self._lock:
+            user, settings, loaded_at = self.users.get(steam_id, (None, None, 0))
+        if top is None and full_library is None:
+            wanted = settings or (15, False)  # Whatever is in memory will do
+        else:
+            wanted = (top or 15, bool(full_library))
+        if user and not rebuild and settings == wanted and time.time() - loaded_at < USER_TTL:
+            return user
+        return self._in_flight.do(("user", steam_id, wanted, rebuild), self._load_user, name, steam_id, *wanted,
+                                  rebuild)
+
+    def _load_user(self, name, steam_id, top, full_library, rebuild):
+        user = SteamUser(steam_id)
+        user.username = name
+        if rebuild:
+            collect_user_data(user, top, full_library)
+        else:
+            refresh_user_data(user, top, full_library)  # Saved profiles pick up new games and playtime
+        if not user.top_games:
+            raise ValueError("No games found (is the profile private?)")
+        with self._lock:
+            self.users[steam_id] = (user, (top, full_library), time.time())
+        return user
+
+    def recommendations(self, name, hops=1, offline=False):
+        user = self.user(name)
+        return self._in_flight.do(("recommendations", user.user_id, hops, offline), self._recommend, user, hops,
+                                  offline)
+
+    @staticmethod
+    def _recommend(user, hops, offline):
+        recommendations = recommend_games(user, hops, offline)
+        user.save_recommendations()
+        return recommendations
+
+    def news(self, name):
+        user = self.user(name)
+        return self._in_flight.do(("news", user.user_id), user.get_news)
+
+    def achievements(self, name):
+        user = self.user(name)
+        return self._in_flight.do(("achievements", user.user_id), self._achievements, user)
+
+    @staticmethod
+    def _achievements(user):
+        user.get_statistics()
+        return user.user_stats
+
+    def stats(self):
+        import http_client
+
+        with self._lock:
+            users = len(self.users)
+        return {"uptime_s": round(time.time() - self.started_at, 1), "users": users,
+                "metadata_cache": get_metadata_cache().stats(), "http": http_client.get_client().stats(),
+                "counters": instrument.snapshot(), "recent_stages": instrument.summary()["totals"]}
+
+
+def user_json(user):
+    return {"user": user.username, "steamid": user.user_id, "top_tags": user.top_tags,
+            "top_games": [game.as_dict() for game in user.top_games]}
+
+
+def flag(query, name):
+    return query.get(name, "0").lower() in ("1", "true", "yes")
+
+
+ROUTES = [
+    ("user", re.compile(r"^/users/([^/]+)/?$")),
+    ("recommendations", re.compile(r"^/users/([^/]+)/recommendations/?$")),
+    ("news", re.compile(r"^/users/([^/]+)/news/?$")),
+    ("achievements", re.compile(r"^/users/([^/]+)/achievements/?$")),
+    ("stats", re.compile(r"^/stats/?$")),
+]
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so a client can reuse its connection
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body):
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        route, match = next(((name, pattern.match(url.path)) for name, pattern in ROUTES
+                             if pattern.match(url.path)), (None, None))
+        name = unquote(match.group(1)) if match and match.groups() else None
+        try:
+            if route == "user":
+                body = user_json(service.user(name, int(query.get("top", 15)), flag(query, "full_library"),
+                                              flag(query, "rebuild")))
+            elif route == "recommendations":
+                body = [game.as_dict() for game in service.recommendations(name, int(query.get("hops", 1)),
+                                                                             flag(query, "offline"))]
+            elif route == "news":
+                body = service.news(name)
+            elif route == "achievements":
+                body = service.achievements(name)
+            elif route == "stats":
+                body = service.stats()
+            else:
+                return self.send(404, {"error": "unknown route"})
+        except LookupError as e:
+            return self.send(404, {"error": str(e)})
+        except ValueError as e:  # Private profiles, bad parameters, nothing found...
+            return self.send(422, {"error": str(e)})
+        except Exception as e:  # Anything one request hits is reported to that request only
+            click.secho(f"⚠️ {self.path}: {type(e).__name__}: {e}", fg="yellow", err=True)
+            return self.send(500, {"error": f"{type(e).__name__}: {e}"})
+        self.send(200, body)
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=SERVICE_PORT, service=None):
+        super().__init__(("127.0.0.1", port), ServiceHandler)  # Local only: there is no authentication
+        self.service = service or SteamSoupService()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def serve(port=SERVICE_PORT):
+    """Run the service until interrupted."""
+    utils.show_progress = False
+    instrument.limit_stages(STAGE_HISTORY)
+    server = ServiceServer(port)
+    click.secho(f"🍲 Steam Soup service listening on {server.url} (Ctrl+C to stop)", fg="cyan")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        click.secho("\n👋 Service stopped.", fg="magenta")
+    finally:
+        server.server_close()
@@ -0,0 +1,108 @@
+import time
+
+import http_client
+import instrument
+from cache import get_metadata_cache
+from config import METADATA_SOURCES, STORE_URL
+from extract import parse_game_page
+from records import Game
+from tag_index import get_tag_index
+from utils import SingleFlight
+
+# Fields a caller can ask for
+TITLE = frozenset({"title", "url"})
+DETAILS = TITLE | {"genres"}
+FULL = DETAILS | {"tags"}  # User tags only appear on the store page
+
+
+class MetadataSource:
+    """One way of getting a game's metadata over the network.
+    `fields` are the fields it fills in and `cost` ranks it against the others (about KB per game)."""
+
+    name = ""
+    fields = frozenset()
+    cost = 0
+
+    def fetch(self, game: Game) -> Game:
+        """Metadata for one game; raises requests.RequestException or ValueError if it can't be had."""
+        raise NotImplementedError
+
+    def store_url(self, game):
+        return f"{STORE_URL}/app/{game['id']}/"
+
+
+class AppDetailsSource(MetadataSource):
+    """The store's JSON appdetails endpoint: title and genres, no user tags."""
+
+    name = "appdetails"
+    fields = DETAILS
+    cost = 20
+
+    def fetch(self, game):
+        response = http_client.get(f"{STORE_URL}/api/appdetails", params={"appids": game['id'], "filters": "basic,genres"})
+        response.raise_for_status()
+        details = (response.json() or {}).get(str(game['id'])) or {}
+        if not details.get("success"):
+            raise ValueError("appdetails has no data for this app")
+        data = details.get("data") or {}
+        if not data.get("name"):
+            raise ValueError("appdetails has no name for this app")
+        return Game(game['id'], data["name"], self.store_url(game), game.get("time", 0),
+                    genres=[genre["description"] for genre in data.get("genres", [])], fetched_at=time.time())
+
+
+class StorePageSource(MetadataSource):
+    """The full store page, the only source of user tags."""
+
+    name = "store_page"
+    fields = FULL
+    cost = 400
+
+    def fetch(self, game):
+        game_url = self.store_url(game)
+        response = http_client.get(game_url)
+        response.raise_for_status()
+        game_name, genres, tags = parse_game_page(response.content)
+        return Game(game['id'], game_name, game_url, game.get("time", 0), tags, genres, time.time())
+
+
+_in_flight = SingleFlight()
+SOURCES = [source for source in (AppDetailsSource(), StorePageSource()) if source.name in METADATA_SOURCES]
+
+
+def cheapest_source(fields=FULL):
+    """The cheapest enabled source that has every field asked for."""
+    for source in sorted(SOURCES, key=lambda source: source.cost):
+        if fields <= source.fields:
+            return source
+    raise ValueError(f"No enabled metadata source provides {', '.join(sorted(fields))}.")
+
+
+def fetch(source, game):
+    """source.fetch, sent once per app however many callers ask for it at the same time."""
+    def fetch_once():
+        instrument.add(f"{source.name}_fetches")
+        return source.fetch(game)
+
+    return _in_flight.do((source.name, int(game['id'])), fetch_once)
+
+
+def remember(games, source):
+    """Cache games fetched from `source`, and index their tags if it has them."""
+    cache = get_metadata_cache()
+    for game in games:
+        cache.put(game, tags="tags" in source.fields)
+    if "tags" in source.fields:
+        get_tag_index().add(games)
+
+
+def lookup(game: Game, fields=FULL) -> Game:
+    """Metadata for one game with at least `fields`, from the local cache if it has them,
+    otherwise from the cheapest source that does (and cached for next time)."""
+    cache = get_metadata_cache()
+    info = cache.get(game['id'], tags="tags" in fields)
+    if info is None:
+        source = cheapest_source(fields)
+        info = fetch(source, game)
+        remember([info], source)
+    return info
@@ -1,9 +1,64 @@
+import glob
 import json
 import os
+import sqlite3
+import time
 
 import click
-import requests
-from config import STEAM_KEY
+
+from cache import get_api_result_cache
+from config import API_URL, MAX_WORKERS, get_steam_key
+from profile_store import get_profile_store
+from records import Game
+from utils import SingleFlight, map_concurrently
+
+# requests and http_client are imported where a request is made, so loading a saved
+# profile never pays for them
+
+_in_flight = SingleFlight()  # Per-app API calls in progress, shared by concurrent callers
+
+
+def resolve_vanity(name):
+    """Resolve a vanity URL name to a Steam ID, remembering the answer in the API result cache."""
+    cache = get_api_result_cache()
+    steam_id = cache.get_steam_id(name)
+    if steam_id:
+        return steam_id
+
+    import http_client
+    import requests
+
+    url = f"{API_URL}/ISteamUser/ResolveVanityURL/v0001/?key={get_steam_key()}&vanityurl={name}"
+    try:
+        response = http_client.get(url).json()
+        steam_id = response['response'].get('steamid', None)
+    except(requests.RequestException, KeyError):
+        return None
+    if steam_id:
+        cache.put_steam_id(name, steam_id)
+    return steam_id
+
+
+def import_json_profile(path, steam_id, username=None):
+    """Save a profile written as JSON by an older version into the profile store. False if it can't be read."""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        top_games = [Game.from_dict(game) for game in data.get("top_games") or []]
+        get_profile_store().save_profile(steam_id, data.get("user") or username or steam_id,
+                                         data.get("top_tags") or {}, top_games)
+    except (IOError, json.JSONDecodeError, KeyError, TypeError, AttributeError, sqlite3.Error):
+        return False
+    return True
+
+
+def import_json_profiles():
+    """Import every profile an older version saved as JSON in the working directory and the store lacks."""
+    store = get_profile_store()
+    for path in glob.glob("*_user_info.json"):
+        steam_id = os.path.basename(path).removesuffix("_user_info.json")
+        if steam_id.isnumeric() and not store.has_profile(steam_id):
+            import_json_profile(path, steam_id)
 
 
 class SteamUser:
@@ -17,142 +72,196 @@ class SteamUser:
         self.top_tags = {}
         self.user_recommendations = []
         self.user_stats = []
+        self.json_export = False  # Also write user data and recommendations to JSON files when saving
         self.user_file_path = f"{self.user_id}_user_info.json"
         self.user_rec_path = f"{self.user_id}_recommendations"
+        self.library_checkpoint_path = f"{self.user_id}_library_checkpoint.json"
 
     def get_steam_id(self):
         """Retrieve the Steam ID"""
         if self.username.isnumeric():
             return self.username  # It's already the ID from the prompt
         else:
+            return resolve_vanity(self.username)
 
-            url = f"https://api.steampowered.com/ISteamUser/ResolveVanityURL/v0001/?key={STEAM_KEY}&vanityurl={self.username}"
-            try:
-                response = requests.get(url).json()
-                return response['response'].get('steamid', None)
-
-            except(requests.RequestException, KeyError):
-                return None
+    def get_owned_games(self, top=15):
+        """Fetch the user's top most-played games from the Steam API, or the whole library if top is None.
+        Raises ValueError if Steam can't be reached; a private profile just has no games."""
+        import http_client
+        import requests
 
-    def get_owned_games(self):
-        """Fetch the user's top 15 most-played games from the Steam API."""
-        url = f"https://api.steampowered.com/IPlayerService/GetOwnedGames/v0001/?key={STEAM_KEY}&steamid={self.user_id}&format=json"
+        key = get_steam_key()
+        url = f"{API_URL}/IPlayerService/GetOwnedGames/v0001/?key={key}&steamid={self.user_id}&format=json"
         try:
-            response = requests.get(url).json()
+            response = http_client.get(url).json()
             all_games = response['response'].get('games', [])
 
             # Extract game IDs and playtime, then sort by playtime
             self.owned_games = sorted(
-                [{"id": g["appid"], "time": g["playtime_forever"]} for g in all_games],
-                key=lambda x: x["time"],
+                [Game(g["appid"], time=g["playtime_forever"]) for g in all_games],
+                key=lambda x: x.time,
                 reverse=True
-            )[:15]
-        except (requests.RequestException, KeyError):
-            print("Error: Failed to retrieve owned games.")
+            )[:top]
+        except (requests.RequestException, KeyError, ValueError) as e:
             self.owned_games = []
+            reason = str(e).replace(key, "<STEAM_KEY>")  # Request errors quote the URL, key and all
+            raise ValueError(f"Failed to retrieve owned games ({type(e).__name__}: {reason})") from e
 
     def save_user(self):
-        """Save user data to a local JSON file for later use."""
-        data = {
-            "user": self.username,
-            "id": self.user_id,
-            "top_tags": self.top_tags,
-            "top_games": self.top_games
-        }
+        """Save user data to the profile store for later use."""
         try:
-            with open(self.user_file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
-            return self.user_file_path
-        except IOError:
-            click.secho("Error: Failed to save user data.", fg="red")
+            get_profile_store().save_profile(self.user_id, self.username, self.top_tags, self.top_games)
+        except sqlite3.Error:
+            click.secho("Error: Failed to save user data.", fg="red", err=True)
+            return
+        if self.json_export:
+            self.export_json()
+
+    def has_saved_data(self):
+        """True if this user has a saved profile, importing one saved as JSON by an older version."""
+        if get_profile_store().has_profile(self.user_id):
+            return True
+        return os.path.exists(self.user_file_path) and import_json_profile(self.user_file_path, self.user_id,
+                                                                            self.username)
 
     def use_saved_user(self):
         """Load previously saved user data if available."""
-        if not os.path.exists(self.user_file_path):
+        if not self.has_saved_data():
             raise ValueError("No saved user data found.")
         try:
-            with open(self.user_file_path, 'r') as f:
-                data = json.load(f)
-                self.user_id = data.get("id")
-                self.username = data.get("user")
-                self.top_games = data.get("top_games")
-                self.top_tags = data.get("top_tags")
+            data = get_profile_store().load_profile(self.user_id)
+            self.username = data["user"]
+            self.top_games = data["top_games"]
+            self.top_tags = data["top_tags"]
             if not self.top_games or not self.top_tags:
                 raise ValueError("Saved data is incomplete (missing games or tags).")
-        except (IOError, json.JSONDecodeError):
+        except (sqlite3.Error, KeyError):
             raise ValueError("Error: Failed to load saved user data.")
         except ValueError as e:
             raise ValueError(f"Error: {e} \n Try again with --clear-cache for new information")
 
+    def export_json(self):
+        """Write user data, and the last recommendations if there are any, to JSON files."""
+        data = {
+            "user": self.username,
+            "id": self.user_id,
+            "top_tags": self.top_tags,
+            "top_games": [game.as_dict() for game in self.top_games],
+            "saved_at": time.time()
+        }
+        recommendations = self.user_recommendations or get_profile_store().load_recommendations(self.user_id)
+        try:
+            with open(self.user_file_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4)
+            if recommendations:
+                with open(self.user_rec_path, "w", encoding="utf-8") as f:
+                    json.dump([game.as_dict() for game in recommendations], f, indent=4)
+            return self.user_file_path
+        except IOError:
+            click.secho("Error: Failed to export user data.", fg="red", err=True)
 
     def clear_cache(self):
         """Delete saved user data and recommendations"""
         try:
-            if os.path.exists(self.user_file_path):
-                os.remove(self.user_file_path)
+            if self.has_saved_data():
+                get_profile_store().delete(self.user_id)
                 click.secho("Deleted user data", fg="white")
-            if os.path.exists(self.user_rec_path):
-                os.remove(self.user_rec_path)
-        except OSError:
-            click.secho("Error:failed to delete cache files.", fg="red")
+            for path in (self.user_file_path, self.user_rec_path, self.library_checkpoint_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        except (OSError, sqlite3.Error):
+            click.secho("Error:failed to delete cache files.", fg="red", err=True)
 
     def save_recommendations(self):
-        """Save user recommendations to a local JSON file for later use."""
+        """Save user recommendations to the profile store for later use."""
         try:
-            with open(self.user_rec_path, "w", encoding="utf-8") as f:
-                json.dump(self.user_recommendations, f, indent=4)
+            get_profile_store().save_recommendations(self.user_id, self.user_recommendations)
+        except sqlite3.Error:
+            click.secho("Error: Failed to save recommendations.", fg="red", err=True)
+            return
+        if self.json_export:
+            self.export_json()
             click.secho(f"View results in {self.user_rec_path}")
-        except (IOError, json.JSONDecodeError):
-            click.secho("Error: Failed to save recommendations.", fg="red")
 
-    def get_user_stats(self,app):
-        """Fetch the user's achievements for a given game."""
-        url = f"http://api.steampowered.com/ISteamUserStats/GetPlayerAchievements/v0001/?appid={app}&key={STEAM_KEY}&steamid={self.user_id}"
+    def get_user_stats(self, app):
+        """The user's achievements for a given game, fetched once however many callers ask at the same time."""
+        return _in_flight.do(("achievements", self.user_id, int(app)), self.fetch_user_stats, app)
+
+    def fetch_user_stats(self,app):
+        """Fetch the user's achievements for a given game, from the cache while they are fresh."""
+        cache = get_api_result_cache()
+        cached = cache.get("achievements", self.user_id, app)
+        if cached is not None:
+            return cached
+        import http_client
+        import requests
+
+        url = f"{API_URL}/ISteamUserStats/GetPlayerAchievements/v0001/?appid={app}&key={get_steam_key()}&steamid={self.user_id}"
         try:
-            response =  requests.get(url)
+            response =  http_client.get(url)
+            if response.status_code == 400:  # Steam answers 400 for games without achievements
+                cache.put("achievements", self.user_id, app, [])
+                return []
             response.raise_for_status()  # Ensure the request was successful
             player_stats = response.json().get("playerstats")
             #Only return achievements if request was successful
-            return player_stats.get("achievements") if player_stats.get("success") else []
+            achievements = player_stats.get("achievements") if player_stats.get("success") else []
+            cache.put("achievements", self.user_id, app, achievements)
+            return achievements
         except requests.RequestException:
-            return [] # return empty list if request fails
+            return [] # return empty list if request fails, and try again next time
 
     def get_statistics(self):
         """Calculates the user's achievement completion percentage for their top games."""
-        for game in self.top_games:
-            user_stats = self.get_user_stats(game['id'])
+        from scraper import game_titles
 
+        all_stats = map_concurrently(lambda game: self.get_user_stats(game['id']), self.top_games, MAX_WORKERS)
+        titles = game_titles([game for game, user_stats in zip(self.top_games, all_stats) if user_stats])
+        self.user_stats = []  # Rebuilt on every call so repeat menu selections don't duplicate rows
+        for game, user_stats in zip(self.top_games, all_stats):
             if user_stats: # proceed only if there are achievements
                 # list of achievements
                 achievements = [item['apiname'] for item in user_stats if item.get("achieved")]
                 # calculate percentage of unlocked achievements
                 percentage = round(len(achievements)/len(user_stats) * 100,2) if user_stats else 0
                 # store the achievement percentage for the game
-                self.user_stats.append({'title': game['title'], 'achieved': percentage})
+                self.user_stats.append({'title': titles[game['id']], 'achieved': percentage})
+
+    def game_news(self, game_id):
+        """The latest news articles for a given game, fetched once however many callers ask at the same time."""
+        return _in_flight.do(("news", int(game_id)), self.fetch_game_news, game_id)
 
-    def game_news(self,game_id):
-        """Fetch the latest news articles for a given game from the Steam API."""
-        url=f"https://api.steampowered.com/ISteamNews/GetNewsForApp/v0002/?appid={game_id}&count=3&maxlength=300&format=json"
+    def fetch_game_news(self,game_id):
+        """Fetch the latest news articles for a given game from the Steam API, from the cache while fresh."""
+        cache = get_api_result_cache()
+        cached = cache.get("news", "", game_id)  # News is the same for every user
+        if cached is not None:
+            return cached
+        import http_client
+        import requests
+
+        url=f"{API_URL}/ISteamNews/GetNewsForApp/v0002/?appid={game_id}&count=3&maxlength=300&format=json"
         try:
-            response = requests.get(url)
+            response = http_client.get(url)
             response.raise_for_status() #ensure request was successful
             news = response.json().get("appnews").get("newsitems")
+            cache.put("news", "", game_id, news)
             return news
         except requests.RequestException:
             return [] # Return an empty list if request fails
 
     def get_news(self):
         """Retrieve the latest news articles for the user's top games."""
+        from scraper import game_titles
+
         news = []
-        for game in self.top_games:
-            articles = self.game_news(game['id'])
+        all_articles = map_concurrently(lambda game: self.game_news(game['id']), self.top_games, MAX_WORKERS)
+        titles = game_titles([game for game, articles in zip(self.top_games, all_articles) if articles])
+        for game, articles in zip(self.top_games, all_articles):
             if articles: #Ensure articles exist
                 news.append({
-                   "game":game['title'],
+                   "game":titles[game['id']],
                     "title":articles[0]['title'],  # Only fetch the latest article
                     "url":articles[0]['url']
                 })
         return news
-
-
-
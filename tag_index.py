@@ -0,0 +1,86 @@
+import math
+from collections import defaultdict
+from dataclasses import replace
+
+import instrument
+from cache import get_metadata_cache
+from config import CACHE_PATH
+from db import connect
+from records import Game
+from utils import Shared
+
+
+class InvertedTagIndex:
+    """Persistent tag → appids index over every app whose tags have been scraped.
+    One row per (tag, app) posting; a tag's document frequency is the length of its postings."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self._db = connect(path)  # One connection per file, shared with the other stores in it
+        self._lock, self._conn = self._db.lock, self._db.conn
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS tag_postings (
+                    tag TEXT NOT NULL,
+                    appid INTEGER NOT NULL,
+                    PRIMARY KEY (tag, appid)
+                ) WITHOUT ROWID""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tag_postings_appid ON tag_postings (appid)")
+            self._conn.commit()
+        if not self.app_count():
+            self.rebuild()  # Fold in everything scraped before the index existed
+
+    def add(self, games):
+        """Index (or re-index) the tags of scraped games."""
+        with self._lock:
+            for game in games:
+                self._conn.execute("DELETE FROM tag_postings WHERE appid = ?", (int(game['id']),))
+                self._conn.executemany("INSERT OR IGNORE INTO tag_postings (tag, appid) VALUES (?, ?)",
+                                       [(tag, int(game['id'])) for tag in game['tags']])
+            self._conn.commit()
+
+    def rebuild(self):
+        """Index every complete entry in the metadata cache."""
+        entries = get_metadata_cache().all_tags()
+        with self._lock:
+            self._conn.execute("DELETE FROM tag_postings")
+            self._conn.executemany("INSERT OR IGNORE INTO tag_postings (tag, appid) VALUES (?, ?)",
+                                   [(tag, appid) for appid, tags in entries for tag in tags])
+            self._conn.commit()
+
+    def postings(self, tag):
+        with self._lock:
+            return [appid for appid, in self._conn.execute("SELECT appid FROM tag_postings WHERE tag = ?", (tag,))]
+
+    def document_frequencies(self):
+        """{tag: number of indexed apps with it}."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT tag, COUNT(*) FROM tag_postings GROUP BY tag"))
+
+    def app_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT appid) FROM tag_postings").fetchone()[0]
+
+    def candidates(self, tag_weights, exclude=(), limit=500):
+        """App IDs sharing the most (weighted, IDF-adjusted) tags with `tag_weights`, best first."""
+        total = self.app_count()
+        exclude = {int(appid) for appid in exclude}
+        scores = defaultdict(float)
+        for tag, weight in tag_weights.items():
+            postings = self.postings(tag)
+            idf = math.log((1 + total) / (1 + len(postings))) + 1
+            for appid in postings:
+                scores[appid] += weight * idf
+        ranked = sorted((appid for appid in scores if appid not in exclude), key=lambda appid: (-scores[appid], appid))
+        return ranked[:limit]
+
+
+def offline_candidates(games: list[Game], tags: dict[str, int], limit=500) -> list[Game]:
+    """Candidate games with their metadata, from the index and the metadata cache only: no network calls."""
+    appids = get_tag_index().candidates(tags, exclude=[game['id'] for game in games], limit=limit)
+    found = get_metadata_cache().get_many(appids)
+    instrument.add("offline_candidates", len(found))
+    return [replace(found[appid], key=key) for key, appid in enumerate(appid for appid in appids if appid in found)]
+
+
+get_tag_index = Shared(InvertedTagIndex)  # The shared tag index, opened on first use
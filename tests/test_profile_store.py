@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profile_store import ProfileStore  # noqa: E402
+from records import Game  # noqa: E402
+
+
+def game(appid, tags):
+    return Game(appid, f"Game {appid}", f"https://store.steampowered.com/app/{appid}", 60, tuple(tags), ("Action",))
+
+
+def test_stores_sharing_a_file_see_each_others_labels(tmp_path):
+    path = str(tmp_path / "profiles.db")
+    first, second = ProfileStore(path), ProfileStore(path)
+    first.save_profile(1, "first", {"RPG": 1}, [game(10, ["RPG"])])
+    assert first.load_profile(1)["top_tags"] == {"RPG": 1}  # The first store's labels are now loaded
+
+    second.save_profile(2, "second", {"Roguelike": 1}, [game(20, ["Roguelike"])])
+    assert first.load_profile(2)["top_games"][0].tags == ("Roguelike",)
+
+    first.save_profile(3, "third", {"Roguelike": 2, "Puzzle": 1}, [game(30, ["Roguelike", "Puzzle"])])
+    assert second.load_profile(3)["top_tags"] == {"Roguelike": 2, "Puzzle": 1}
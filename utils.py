@@ -1,11 +1,41 @@
 import click
+import contextlib
 import functools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from urllib.parse import urlparse
+
+import instrument
+
+show_progress = True  # Turned off for headless runs, where bars would interleave with the output
+stopping = threading.Event()  # Set on exit, so queued calls are skipped instead of started
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def quiet():
+    """No progress bars or skip warnings from this thread while inside, for work running behind the menu."""
+    _local.quiet = True
+    try:
+        yield
+    finally:
+        _local.quiet = False
+
+
+def is_quiet():
+    return getattr(_local, "quiet", False)
+
 
 def progress_bar(length=None):
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             label = kwargs.get("label", "Processing...")
+            if not show_progress or is_quiet():
+                with instrument.stage(func.__name__, label):
+                    return func(*args, **kwargs, bar=None)
 
             iterable = args[0] if args else kwargs.get("data", [])
             total = length or len(iterable)
@@ -13,7 +43,9 @@ def progress_bar(length=None):
             fill_char = click.style("♥", fg="red")
             empty_char = click.style("♡", fg="white", dim=True)
 
-            with click.progressbar(length=total, label=label, fill_char=fill_char, empty_char=empty_char) as bar:
+            # Every stage drawn with a bar is also timed and counted
+            with instrument.stage(func.__name__, label), \
+                    click.progressbar(length=total, label=label, fill_char=fill_char, empty_char=empty_char) as bar:
                 return func(*args, **kwargs, bar=bar)  # Pass progress bar to function
 
         return wrapper
@@ -21,3 +53,162 @@ def progress_bar(length=None):
     return decorator
 
 
+class RateLimiter:
+    """Token bucket per host: up to `burst` calls go out at once, then no more than `rate` per second."""
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1 / rate if rate else 0
+        self.burst = max(1, burst)
+        self._next_slot = {}  # When each host's bucket is next empty, were no more calls made
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """Block until the host of `url` may be requested again."""
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            empty_at = max(now, self._next_slot.get(host, now))
+            slot = max(now, empty_at - (self.burst - 1) * self.interval)
+            self._next_slot[host] = empty_at + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def map_concurrently(func, items, max_workers, bar=None, errors=(Exception,), on_error=None):
+    """Runs func over items on a thread pool and returns the results in input order.
+    Items whose call raises one of `errors` are handed to on_error and come back as None,
+    as do items still queued once `stopping` is set."""
+    results = [None] * len(items)
+    if not items:
+        return results
+
+    @instrument.carry
+    def call(item):
+        return None if stopping.is_set() else func(item)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        futures = {pool.submit(call, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except errors as e:
+                if on_error:
+                    on_error(items[index], e)
+            if bar:
+                bar.update(1)  # Only the calling thread touches the bar
+
+    return results
+
+
+def stream_concurrently(func, items, max_workers, errors=(Exception,), on_error=None, deadline=None):
+    """Lazy map_concurrently: yields (item, result) in input order while keeping at most
+    2 * max_workers calls in flight, so items can come from a generator of any length.
+    With a deadline (a time.perf_counter() value), the stream ends once the next result isn't ready by then."""
+    in_flight = deque()
+
+    def ready():
+        if deadline is None:
+            return True
+        return bool(wait([in_flight[0][1]], timeout=max(0, deadline - time.perf_counter())).done)
+
+    def next_result():
+        item, future = in_flight.popleft()
+        try:
+            return item, future.result()
+        except errors as e:
+            if on_error:
+                on_error(item, e)
+            return item, None
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    func = instrument.carry(func)
+    try:
+        for item in items:
+            in_flight.append((item, pool.submit(func, item)))
+            if len(in_flight) >= 2 * max_workers:
+                if not ready():
+                    return
+                yield next_result()
+        while in_flight:
+            if not ready():
+                return
+            yield next_result()
+    finally:
+        # Closed early or out of time: drop queued calls and leave running ones to finish in the background
+        pool.shutdown(wait=not in_flight, cancel_futures=True)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key: the first one runs, the others wait for it
+    and get its result (or its exception) instead of repeating the work."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            instrument.add("coalesced")
+            return call.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class LRUCache:
+    """Thread-safe in-memory map that drops the least recently used entry past `size` entries."""
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Shared:
+    """One instance of `factory`, made on first use and then handed to every caller.
+    `instance` can be set directly to swap it (benchmarks point the app at fresh stores this way)."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.instance = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            if self.instance is None:
+                self.instance = self.factory()
+            return self.instance